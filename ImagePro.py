@@ -1,624 +1,3836 @@
-import os
-import json
-import threading
-import random
-import shutil
-from PIL import Image, ImageTk
-import imagehash
-from collections import defaultdict
-import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext, ttk
-import tkinter.font as tkFont
-
-SETTINGS_FILE = "settings.json"
-
-def find_duplicates(image_dir, progress_callback, stop_flag):
-    hashes = defaultdict(list)
-    duplicates = []
-    files = [f for f in os.listdir(image_dir) if f.lower().endswith(('jpg', 'jpeg', 'png', 'bmp', 'gif', 'tiff'))]
-
-    for idx, filename in enumerate(files, 1):
-        if stop_flag['stop']:
-            break
-        path = os.path.join(image_dir, filename)
-        try:
-            with Image.open(path) as img:
-                h = str(imagehash.phash(img))
-        except Exception:
-            continue
-        hashes[h].append(filename)
-        progress_callback(f"Перевірено {idx}/{len(files)} файлів", idx, len(files))
-
-    for file_list in hashes.values():
-        if len(file_list) > 1:
-            duplicates.append(file_list)
-
-    if duplicates:
-        dup_dir = os.path.join(image_dir, "Duplicate")
-        os.makedirs(dup_dir, exist_ok=True)
-        moved = set()
-        for group in duplicates:
-            for file in group[1:]:
-                if file not in moved:
-                    shutil.move(os.path.join(image_dir, file), os.path.join(dup_dir, file))
-                    moved.add(file)
-
-    return duplicates
-
-def split_dataset(folder, train_pct, val_pct, test_pct, log_callback):
-    files = [f for f in os.listdir(folder) if f.lower().endswith(('jpg', 'jpeg', 'png', 'bmp', 'gif', 'tiff'))]
-    random.shuffle(files)
-    train_count = int(len(files) * train_pct / 100)
-    val_count = int(len(files) * val_pct / 100)
-    train_files = files[:train_count]
-    val_files = files[train_count:train_count+val_count]
-    test_files = files[train_count+val_count:]
-
-    for subfolder, subfiles in zip(['train', 'val', 'test'], [train_files, val_files, test_files]):
-        img_path = os.path.join(folder, 'images', subfolder)
-        os.makedirs(img_path, exist_ok=True)
-        for f in subfiles:
-            shutil.copy2(os.path.join(folder, f), os.path.join(img_path, f))
-        log_callback(f"✓ {subfolder.upper()}: {len(subfiles)} файлів")
-
-    stats = {}
-    for subfolder in ['train', 'val', 'test']:
-        img_path = os.path.join(folder, 'images', subfolder)
-        count = len([f for f in os.listdir(img_path) if f.lower().endswith(('jpg', 'jpeg', 'png', 'bmp', 'gif', 'tiff'))])
-        stats[subfolder] = count
-
-    with open("split_log.txt", "w", encoding='utf-8') as f:
-        f.write(f"Dataset Split Results:\n")
-        f.write(f"Train: {len(train_files)} files\n")
-        f.write(f"Validation: {len(val_files)} files\n")
-        f.write(f"Test: {len(test_files)} files\n")
-        f.write("\nСтатистика по підпапках:\n")
-        for k, v in stats.items():
-            f.write(f"{k}: {v} зображень\n")
-
-class ModernApp:
-    def __init__(self, master):
-        self.master = master
-        master.title("ImagePro - Duplicate Checker & Dataset Splitter")
-        master.geometry("900x700")
-        master.minsize(800, 600)
-        master.configure(bg="#f8f9fa")
-        
-        try:
-            master.iconbitmap("app_icon.ico")
-        except:
-            pass
-        
-        self.folder = ''
-        self.stop_flag = {'stop': False}
-        self.load_settings()
-        
-        self.setup_styles()
-        
-        self.create_header()
-        self.create_main_content()
-        self.create_footer()
-        
-        self.center_window()
-        
-    def setup_styles(self):
-        """Налаштування сучасних стилів"""
-        style = ttk.Style()
-        style.theme_use('clam')
-        
-        self.colors = {
-            'primary': '#2563eb',
-            'primary_hover': '#1d4ed8',
-            'secondary': '#64748b',
-            'success': '#10b981',
-            'danger': '#ef4444',
-            'warning': '#f59e0b',
-            'light': '#f8fafc',
-            'dark': '#1e293b',
-            'white': '#ffffff',
-            'border': '#e2e8f0'
-        }
-        
-        self.fonts = {
-            'title': tkFont.Font(family='Segoe UI', size=20, weight='bold'),
-            'subtitle': tkFont.Font(family='Segoe UI', size=12, weight='normal'),
-            'button': tkFont.Font(family='Segoe UI', size=10, weight='bold'),
-            'label': tkFont.Font(family='Segoe UI', size=10),
-            'entry': tkFont.Font(family='Segoe UI', size=10)
-        }
-        
-        style.configure("Primary.TButton", 
-                       background=self.colors['primary'],
-                       foreground=self.colors['white'],
-                       borderwidth=0,
-                       focuscolor='none',
-                       padding=(20, 12))
-        
-        style.configure("Secondary.TButton",
-                       background=self.colors['secondary'],
-                       foreground=self.colors['white'],
-                       borderwidth=0,
-                       focuscolor='none',
-                       padding=(15, 10))
-        
-        style.configure("Success.TButton",
-                       background=self.colors['success'],
-                       foreground=self.colors['white'],
-                       borderwidth=0,
-                       focuscolor='none',
-                       padding=(15, 10))
-        
-        style.configure("Danger.TButton",
-                       background=self.colors['danger'],
-                       foreground=self.colors['white'],
-                       borderwidth=0,
-                       focuscolor='none',
-                       padding=(15, 10))
-        
-        style.configure("Title.TLabel",
-                       background=self.colors['light'],
-                       foreground=self.colors['dark'],
-                       font=self.fonts['title'])
-        
-        style.configure("Subtitle.TLabel",
-                       background=self.colors['light'],
-                       foreground=self.colors['secondary'],
-                       font=self.fonts['subtitle'])
-        
-        style.configure("Modern.TLabel",
-                       background=self.colors['white'],
-                       foreground=self.colors['dark'],
-                       font=self.fonts['label'])
-        
-        style.configure("Modern.TEntry",
-                       fieldbackground=self.colors['white'],
-                       foreground=self.colors['dark'],
-                       borderwidth=2,
-                       relief='solid',
-                       font=self.fonts['entry'])
-        
-        style.configure("Modern.Horizontal.TProgressbar",
-                       background=self.colors['primary'],
-                       troughcolor=self.colors['border'],
-                       borderwidth=0,
-                       lightcolor=self.colors['primary'],
-                       darkcolor=self.colors['primary'])
-    
-    def create_header(self):
-        """Створення заголовка"""
-        header_frame = tk.Frame(self.master, bg=self.colors['light'], height=100)
-        header_frame.pack(fill='x', padx=20, pady=(20, 0))
-        header_frame.pack_propagate(False)
-        
-        title_label = ttk.Label(header_frame, text="ImagePro", style="Title.TLabel")
-        title_label.pack(side='left', padx=10, pady=20)
-        
-        subtitle_label = ttk.Label(header_frame, 
-                                 text="Професійний інструмент для пошуку дублікатів та розподілу датасетів",
-                                 style="Subtitle.TLabel")
-        subtitle_label.pack(side='left', padx=10, pady=25)
-    
-    def create_main_content(self):
-        """Створення основного контенту"""
-        main_frame = tk.Frame(self.master, bg=self.colors['light'])
-        main_frame.pack(fill='both', expand=True, padx=20, pady=20)
-        
-        top_frame = tk.Frame(main_frame, bg=self.colors['light'])
-        top_frame.pack(fill='both', expand=True)
-        
-        self.create_duplicates_panel(top_frame)
-        
-        self.create_logs_panel(top_frame)
-        
-        self.create_dataset_panel(top_frame)
-    
-    def create_duplicates_panel(self, parent):
-        """Панель для пошуку дублікатів"""
-        duplicates_frame = tk.Frame(parent, bg=self.colors['white'], relief='solid', bd=1)
-        duplicates_frame.pack(side='left', fill='both', expand=True, padx=(0, 10))
-        
-        title_frame = tk.Frame(duplicates_frame, bg=self.colors['primary'], height=50)
-        title_frame.pack(fill='x')
-        title_frame.pack_propagate(False)
-        
-        ttk.Label(title_frame, text="🔍 Пошук дублікатів", 
-                 foreground=self.colors['white'], background=self.colors['primary'],
-                 font=self.fonts['button']).pack(pady=15)
-        
-        content_frame = tk.Frame(duplicates_frame, bg=self.colors['white'])
-        content_frame.pack(fill='both', expand=True, padx=20, pady=20)
-        
-        folder_frame = tk.Frame(content_frame, bg=self.colors['white'])
-        folder_frame.pack(fill='x', pady=(0, 20))
-        
-        ttk.Label(folder_frame, text="Оберіть папку для сканування:", 
-                 style="Modern.TLabel").pack(anchor='w', pady=(0, 10))
-        
-        self.folder_label = ttk.Label(folder_frame, text="📁 Папка не обрана", 
-                                    style="Modern.TLabel",
-                                    foreground=self.colors['secondary'])
-        self.folder_label.pack(anchor='w', pady=(0, 10))
-        
-        ttk.Button(folder_frame, text="📂 Обрати папку", 
-                  command=self.select_folder, style="Primary.TButton").pack(pady=10)
-        
-        buttons_frame = tk.Frame(content_frame, bg=self.colors['white'])
-        buttons_frame.pack(fill='x', pady=20)
-        
-        ttk.Button(buttons_frame, text="🚀 Знайти дублікати", 
-                  command=self.start_duplicates, style="Success.TButton").pack(fill='x', pady=(0, 10))
-        
-        ttk.Button(buttons_frame, text="⏹ Зупинити", 
-                  command=self.stop_duplicates, style="Danger.TButton").pack(fill='x')
-        
-        self.stats_frame = tk.Frame(content_frame, bg=self.colors['light'], relief='solid', bd=1)
-        self.stats_frame.pack(fill='x', pady=(20, 0))
-        
-        ttk.Label(self.stats_frame, text="📊 Статистика", 
-                 style="Modern.TLabel", font=self.fonts['button']).pack(pady=(10, 5))
-        
-        self.stats_text = ttk.Label(self.stats_frame, text="Готовий до сканування", 
-                                   style="Modern.TLabel")
-        self.stats_text.pack(pady=(0, 10))
-    
-    def create_dataset_panel(self, parent):
-        """Панель для розподілу датасету"""
-        dataset_frame = tk.Frame(parent, bg=self.colors['white'], relief='solid', bd=1)
-        dataset_frame.pack(side='right', fill='both', expand=True, padx=(10, 0))
-        
-        title_frame = tk.Frame(dataset_frame, bg=self.colors['success'], height=50)
-        title_frame.pack(fill='x')
-        title_frame.pack_propagate(False)
-        
-        ttk.Label(title_frame, text="📊 Розподіл датасету", 
-                 foreground=self.colors['white'], background=self.colors['success'],
-                 font=self.fonts['button']).pack(pady=15)
-        
-        content_frame = tk.Frame(dataset_frame, bg=self.colors['white'])
-        content_frame.pack(fill='both', expand=True, padx=20, pady=20)
-        
-        ttk.Label(content_frame, text="Налаштування розподілу (%)", 
-                 style="Modern.TLabel", font=self.fonts['button']).pack(anchor='w', pady=(0, 20))
-        
-        train_frame = tk.Frame(content_frame, bg=self.colors['white'])
-        train_frame.pack(fill='x', pady=10)
-        
-        ttk.Label(train_frame, text="🎯 Тренування:", style="Modern.TLabel").pack(side='left')
-        self.train_entry = ttk.Entry(train_frame, style="Modern.TEntry", width=10)
-        self.train_entry.pack(side='right')
-        self.train_entry.insert(0, self.settings.get("train", "70"))
-        
-        val_frame = tk.Frame(content_frame, bg=self.colors['white'])
-        val_frame.pack(fill='x', pady=10)
-        
-        ttk.Label(val_frame, text="🔍 Валідація:", style="Modern.TLabel").pack(side='left')
-        self.val_entry = ttk.Entry(val_frame, style="Modern.TEntry", width=10)
-        self.val_entry.pack(side='right')
-        self.val_entry.insert(0, self.settings.get("val", "15"))
-        
-        test_frame = tk.Frame(content_frame, bg=self.colors['white'])
-        test_frame.pack(fill='x', pady=10)
-        
-        ttk.Label(test_frame, text="🧪 Тестування:", style="Modern.TLabel").pack(side='left')
-        self.test_entry = ttk.Entry(test_frame, style="Modern.TEntry", width=10)
-        self.test_entry.pack(side='right')
-        self.test_entry.insert(0, self.settings.get("test", "15"))
-        
-        self.create_distribution_chart(content_frame)
-        
-        ttk.Button(content_frame, text="⚡ Розподілити датасет", 
-                  command=self.run_split, style="Success.TButton").pack(fill='x', pady=20)
-    
-    def create_distribution_chart(self, parent):
-        """Створення візуалізації розподілу"""
-        chart_frame = tk.Frame(parent, bg=self.colors['light'], relief='solid', bd=1)
-        chart_frame.pack(fill='x', pady=20)
-        
-        ttk.Label(chart_frame, text="📈 Поточний розподіл", 
-                 style="Modern.TLabel", font=self.fonts['button']).pack(pady=(10, 5))
-        
-        self.chart_container = tk.Frame(chart_frame, bg=self.colors['light'])
-        self.chart_container.pack(fill='x', padx=20, pady=(0, 10))
-        
-        self.update_chart()
-    
-    def update_chart(self):
-        """Оновлення візуалізації розподілу"""
-        for widget in self.chart_container.winfo_children():
-            widget.destroy()
-        
-        try:
-            train = float(self.train_entry.get() or 0)
-            val = float(self.val_entry.get() or 0)
-            test = float(self.test_entry.get() or 0)
-            
-            total = train + val + test
-            if total == 0:
-                return
-            
-            for name, value, color in [("Train", train, self.colors['primary']), 
-                                     ("Val", val, self.colors['warning']), 
-                                     ("Test", test, self.colors['success'])]:
-                frame = tk.Frame(self.chart_container, bg=self.colors['light'])
-                frame.pack(fill='x', pady=2)
-                
-                label = tk.Label(frame, text=f"{name}: {value}%", 
-                               bg=self.colors['light'], fg=self.colors['dark'],
-                               font=self.fonts['label'])
-                label.pack(side='left')
-                
-                bar_frame = tk.Frame(frame, bg=self.colors['border'], height=20)
-                bar_frame.pack(side='right', fill='x', expand=True, padx=(10, 0))
-                
-                if total > 0:
-                    width = int((value / 100) * 200)
-                    bar = tk.Frame(bar_frame, bg=color, height=20, width=width)
-                    bar.pack(side='left')
-                    
-        except ValueError:
-            pass
-    
-    def create_logs_panel(self, parent):
-        """Панель логів"""
-        logs_frame = tk.Frame(parent, bg=self.colors['white'], relief='solid', bd=1)
-        logs_frame.pack(side='left', fill='both', expand=True, padx=10)
-        
-        title_frame = tk.Frame(logs_frame, bg=self.colors['secondary'], height=50)
-        title_frame.pack(fill='x')
-        title_frame.pack_propagate(False)
-        
-        ttk.Label(title_frame, text="📋 Логи виконання", 
-                 foreground=self.colors['white'], background=self.colors['secondary'],
-                 font=self.fonts['button']).pack(pady=15)
-        
-        logs_content = tk.Frame(logs_frame, bg=self.colors['white'])
-        logs_content.pack(fill='both', expand=True, padx=20, pady=20)
-        
-        self.log = scrolledtext.ScrolledText(logs_content, 
-                                           width=40, height=15,
-                                           bg=self.colors['dark'],
-                                           fg=self.colors['white'],
-                                           font=self.fonts['entry'],
-                                           wrap=tk.WORD)
-        self.log.pack(fill='both', expand=True)
-        
-        self.progress = ttk.Progressbar(logs_content, style="Modern.Horizontal.TProgressbar")
-        self.progress.pack(fill='x', pady=(10, 0))
-    
-    def create_footer(self):
-        """Створення футера"""
-        footer_frame = tk.Frame(self.master, bg=self.colors['dark'], height=40)
-        footer_frame.pack(fill='x', side='bottom')
-        footer_frame.pack_propagate(False)
-        
-        status_label = tk.Label(footer_frame, text="Готовий до роботи", 
-                               bg=self.colors['dark'], fg=self.colors['white'],
-                               font=self.fonts['label'])
-        status_label.pack(side='left', padx=20, pady=10)
-        
-        version_label = tk.Label(footer_frame, text="v2.0 Professional", 
-                                bg=self.colors['dark'], fg=self.colors['secondary'],
-                                font=self.fonts['label'])
-        version_label.pack(side='right', padx=20, pady=10)
-    
-    def center_window(self):
-        """Центрування вікна на екрані"""
-        self.master.update_idletasks()
-        width = self.master.winfo_width()
-        height = self.master.winfo_height()
-        x = (self.master.winfo_screenwidth() // 2) - (width // 2)
-        y = (self.master.winfo_screenheight() // 2) - (height // 2)
-        self.master.geometry(f'{width}x{height}+{x}+{y}')
-    
-    def load_settings(self):
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, 'r') as f:
-                self.settings = json.load(f)
-        else:
-            self.settings = {}
-    
-    def save_settings(self):
-        self.settings = {
-            "train": self.train_entry.get(),
-            "val": self.val_entry.get(),
-            "test": self.test_entry.get()
-        }
-        with open(SETTINGS_FILE, 'w') as f:
-            json.dump(self.settings, f)
-    
-    def select_folder(self):
-        self.folder = filedialog.askdirectory()
-        if self.folder:
-            self.folder_label.config(text=f"📁 {os.path.basename(self.folder)}")
-            self.log.insert(tk.END, f"✓ Обрано папку: {self.folder}\n")
-            self.log.see(tk.END)
-            
-            try:
-                files = [f for f in os.listdir(self.folder) if f.lower().endswith(('jpg', 'jpeg', 'png', 'bmp', 'gif', 'tiff'))]
-                self.stats_text.config(text=f"Знайдено {len(files)} зображень")
-            except:
-                self.stats_text.config(text="Помилка читання папки")
-    
-    def start_duplicates(self):
-        if not self.folder:
-            messagebox.showerror("Помилка", "Будь ласка, оберіть папку для сканування")
-            return
-
-        self.stop_flag['stop'] = False
-        self.log.insert(tk.END, "🚀 Початок пошуку дублікатів...\n")
-        self.log.see(tk.END)
-
-        thread = threading.Thread(target=self.run_duplicates)
-        thread.daemon = True
-        thread.start()
-    
-    def stop_duplicates(self):
-        self.stop_flag['stop'] = True
-        self.log.insert(tk.END, "⏹ Зупинено користувачем\n")
-        self.log.see(tk.END)
-    
-    def run_duplicates(self):
-        try:
-            files = [f for f in os.listdir(self.folder) if f.lower().endswith(('jpg', 'jpeg', 'png', 'bmp', 'gif', 'tiff'))]
-            self.progress['maximum'] = len(files)
-            self.progress['value'] = 0
-            
-            def update(text, current, total):
-                self.master.after(0, lambda: self.update_progress(text, current, total))
-            
-            dups = find_duplicates(self.folder, update, self.stop_flag)
-            
-            if not self.stop_flag['stop']:
-                self.master.after(0, lambda: self.show_results(dups))
-                
-        except Exception as e:
-            self.master.after(0, lambda: self.show_error(str(e)))
-    
-    def update_progress(self, text, current, total):
-        self.log.insert(tk.END, f"{text}\n")
-        self.log.see(tk.END)
-        self.progress['value'] = current
-        self.stats_text.config(text=f"Прогрес: {current}/{total}")
-    
-    def show_results(self, dups):
-        self.progress['value'] = 0
-        if dups:
-            moved_count = sum(len(group) - 1 for group in dups)
-            result = f"✅ Знайдено {len(dups)} груп дублікатів\n"
-            result += f"📁 Переміщено {moved_count} файлів до папки 'Duplicate'\n"
-            self.log.insert(tk.END, result)
-            self.stats_text.config(text=f"Знайдено {len(dups)} груп дублікатів")
-            self.show_duplicates_preview(dups)
-        else:
-            result = "✅ Дублікати не знайдено"
-            self.log.insert(tk.END, result + "\n")
-            self.stats_text.config(text="Дублікати не знайдено")
-        
-        self.log.see(tk.END)
-        messagebox.showinfo("Результат", result)
-
-    def show_duplicates_preview(self, dups):
-        """Відкрити вікно з прев’ю знайдених дублікатів з можливістю масштабування"""
-        preview_win = tk.Toplevel(self.master)
-        preview_win.title("Прев’ю дублікатів")
-        preview_win.geometry("900x700")
-        canvas = tk.Canvas(preview_win, bg="#f8fafc")
-        canvas.pack(fill='both', expand=True, side='left')
-        scrollbar = ttk.Scrollbar(preview_win, orient="vertical", command=canvas.yview)
-        scrollbar.pack(side='right', fill='y')
-        canvas.configure(yscrollcommand=scrollbar.set)
-        frame = tk.Frame(canvas, bg="#f8fafc")
-        canvas.create_window((0, 0), window=frame, anchor='nw')
-
-        size_frame = tk.Frame(preview_win, bg="#f8fafc")
-        size_frame.place(relx=0.5, rely=0, anchor='n')
-        tk.Label(size_frame, text="Розмір мініатюр (80-500):", bg="#f8fafc").pack(side='left')
-        thumb_size_var = tk.StringVar(value="150")
-        size_entry = tk.Entry(size_frame, textvariable=thumb_size_var, width=5)
-        size_entry.pack(side='left', padx=5)
-
-        preview_win.thumbs = []
-
-        def render_thumbnails():
-            for widget in frame.winfo_children():
-                widget.destroy()
-            preview_win.thumbs.clear()
-            try:
-                thumb_size = int(thumb_size_var.get())
-                if thumb_size < 80:
-                    thumb_size = 80
-                if thumb_size > 500:
-                    thumb_size = 500
-            except ValueError:
-                thumb_size = 150
-            thumb_size_var.set(str(thumb_size))
-            for idx, group in enumerate(dups, 1):
-                group_label = tk.Label(frame, text=f"Група {idx} ({len(group)}):", font=("Segoe UI", 10, "bold"), bg="#f8fafc")
-                group_label.pack(anchor='w', pady=(10, 0))
-                row = tk.Frame(frame, bg="#f8fafc")
-                row.pack(anchor='w', pady=(0, 10))
-                for file in group:
-                    img_path = os.path.join(self.folder, "Duplicate", file) if os.path.exists(os.path.join(self.folder, "Duplicate", file)) else os.path.join(self.folder, file)
-                    try:
-                        img = Image.open(img_path)
-                        img.thumbnail((thumb_size, thumb_size))
-                        thumb = ImageTk.PhotoImage(img)
-                        preview_win.thumbs.append(thumb)
-                        lbl = tk.Label(row, image=thumb, text=file, compound='top', bg="#f8fafc")
-                        lbl.pack(side='left', padx=5)
-                    except Exception:
-                        lbl = tk.Label(row, text=file, bg="#f8fafc", fg="red")
-                        lbl.pack(side='left', padx=5)
-            frame.update_idletasks()
-            canvas.config(scrollregion=canvas.bbox("all"))
-
-        def _on_mousewheel(event):
-            if event.delta:
-                canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-            elif event.num == 4:
-                canvas.yview_scroll(-3, "units")
-            elif event.num == 5:
-                canvas.yview_scroll(3, "units")
-        canvas.bind_all("<MouseWheel>", _on_mousewheel)
-        canvas.bind_all("<Button-4>", _on_mousewheel)
-        canvas.bind_all("<Button-5>", _on_mousewheel)
-
-        def on_entry_change(*args):
-            render_thumbnails()
-        thumb_size_var.trace_add("write", on_entry_change)
-        size_entry.bind('<Return>', lambda e: render_thumbnails())
-        size_entry.bind('<FocusOut>', lambda e: render_thumbnails())
-
-        render_thumbnails()
-    
-    def show_error(self, error):
-        self.log.insert(tk.END, f"❌ Помилка: {error}\n")
-        self.log.see(tk.END)
-        messagebox.showerror("Помилка", error)
-    
-    def run_split(self):
-        try:
-            train = float(self.train_entry.get())
-            val = float(self.val_entry.get())
-            test = float(self.test_entry.get())
-            
-            if abs(train + val + test - 100) > 0.01:
-                messagebox.showerror("Помилка", "Сума відсотків має дорівнювати 100%")
-                return
-            
-            if not self.folder:
-                messagebox.showerror("Помилка", "Будь ласка, оберіть папку")
-                return
-            
-            self.save_settings()
-            self.update_chart()
-            
-            self.log.insert(tk.END, "⚡ Початок розподілу датасету...\n")
-            self.log.see(tk.END)
-            
-            def log_callback(text):
-                self.log.insert(tk.END, f"{text}\n")
-                self.log.see(tk.END)
-            
-            split_dataset(self.folder, train, val, test, log_callback)
-            
-            self.log.insert(tk.END, "✅ Датасет успішно розподілено!\n")
-            self.log.see(tk.END)
-            messagebox.showinfo("Готово", "Датасет успішно розподілено!\nЛог збережено у файл split_log.txt")
-            
-        except ValueError:
-            messagebox.showerror("Помилка", "Будь ласка, введіть коректні числові значення")
-        except Exception as e:
-            messagebox.showerror("Помилка", f"Виникла помилка: {str(e)}")
-
-if __name__ == '__main__':
-    root = tk.Tk()
-    app = ModernApp(root)
-    
-    def on_entry_change(*args):
-        app.update_chart()
-    
-    for entry in [app.train_entry, app.val_entry, app.test_entry]:
-        entry.bind('<KeyRelease>', on_entry_change)
-    
-    root.mainloop()
+import os
+import sys
+import json
+import threading
+import random
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import errno
+import csv
+import queue
+import time
+import logging
+import warnings
+import zipfile
+import tarfile
+import io
+import gzip
+import heapq
+from array import array
+from collections import defaultdict, namedtuple, OrderedDict
+from contextlib import contextmanager, nullcontext
+from fnmatch import fnmatch
+from itertools import accumulate, combinations, islice
+from math import comb
+
+SETTINGS_FILE = "settings.json"
+CACHE_FILE = ".imagepro_cache.db"
+CACHE_LOCK_TIMEOUT = 300.0
+DUPLICATE_DIR = "Duplicate"
+HASH_CHUNK_SIZE = 32
+HASH_DECODE_SIZE = 256
+HASH_ALGORITHMS = ('phash', 'ahash', 'dhash', 'whash', 'colorhash')
+HASH_HEX_WIDTH = {'phash': 16, 'ahash': 16, 'dhash': 16, 'whash': 16, 'colorhash': 11}
+DEFAULT_ALGORITHM = 'phash'
+MAX_HASH_PIXELS = 200_000_000
+PROGRESS_BATCH = 256
+CHECKPOINT_INTERVAL = 30.0
+WATCH_SETTLE = 0.2
+WATCH_POLL_INTERVAL = 0.25
+WATCH_WRITE_TIMEOUT = 5.0
+REFERENCE_BLOCKS = 4
+REFERENCE_CHUNK = 1 << 20
+REFERENCE_MAX_FLIPS = 3
+HEAD_DIGEST_SIZE = 4096
+DIGEST_BLOCK_SIZE = 1 << 20
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'bmp', 'gif', 'tiff')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+ARCHIVE_SEPARATOR = ':'
+SKIP_DIRS = (DUPLICATE_DIR, 'images')
+SPLITS = ('train', 'val', 'test')
+MANIFEST_FILE = "split_manifest.jsonl"
+SPLIT_MODES = ('copy', 'hardlink', 'reflink', 'symlink', 'move', 'shards')
+SHARD_SIZE = 1 << 30
+SPLIT_TOLERANCE = 1.0
+SHARD_INDEX = "index.jsonl"
+HASH_INDEX_FORMAT = "imagepro-hashes"
+IO_WORKERS = 8
+FICLONE = 0x40049409
+UI_POLL_MS = 50
+UI_BATCH = 200
+PROGRESS_INTERVAL = 0.1
+LOG_MAX_LINES = 500
+THUMB_MIN_SIZE = 80
+THUMB_MAX_SIZE = 500
+THUMB_STORE_SIZES = (128, 256)
+THUMB_QUALITY = 80
+THUMB_CACHE_BYTES = 256 * 1024 * 1024
+THUMB_WORKERS = 4
+PREVIEW_DEBOUNCE_MS = 300
+PREVIEW_ROW_EXTRA = 70
+LOG_FILE = "imagepro.log"
+STAGE_NAMES = {
+    'hash': "Хешування",
+    'group': "Групування",
+    'move': "Переміщення",
+    'place': "Розміщення",
+    'manifest': "Маніфест",
+    'done': "Готово",
+}
+METRICS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+METRICS_SLOWEST = 10
+EXIT_ERROR = 1
+EXIT_INTERRUPTED = 130
+
+logger = logging.getLogger('imagepro')
+
+ImageEntry = namedtuple('ImageEntry', 'path size mtime_ns')
+HashResult = namedtuple('HashResult', 'hash thumbs timings')
+
+class PathTable:
+    """Інтернована таблиця шляхів: усі шляхи в одному буфері UTF-8 і масив зміщень замість окремих об'єктів str"""
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('q', [0])
+
+    def append(self, path):
+        data = self.data
+        data += path.encode('utf-8', 'surrogateescape')
+        self.offsets.append(len(data))
+        return len(self.offsets) - 2
+
+    def extend(self, paths):
+        encoded = [path.encode('utf-8', 'surrogateescape') for path in paths]
+        self.data += b''.join(encoded)
+        self.offsets.extend(islice(accumulate(map(len, encoded), initial=self.offsets[-1]), 1, None))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        return self.data[self.offsets[idx]:self.offsets[idx + 1]].decode('utf-8', 'surrogateescape')
+
+    def __iter__(self):
+        data, offsets = self.data, self.offsets
+        for start, end in zip(offsets, islice(offsets, 1, None)):
+            yield data[start:end].decode('utf-8', 'surrogateescape')
+
+class EntryTable:
+    """Компактний список ImageEntry для великих папок: шляхи в PathTable, розмір і mtime — у масивах int64"""
+    def __init__(self, entries=()):
+        self.paths = PathTable()
+        self.sizes = array('q')
+        self.mtimes = array('q')
+        for entry in entries:
+            self.append(entry)
+
+    def append(self, entry):
+        path, size, mtime_ns = entry
+        self.paths.append(path)
+        self.sizes.append(size)
+        self.mtimes.append(mtime_ns)
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __getitem__(self, idx):
+        return ImageEntry(self.paths[idx], self.sizes[idx], self.mtimes[idx])
+
+    def __iter__(self):
+        return map(ImageEntry._make, zip(self.paths, self.sizes, self.mtimes))
+
+def is_image_path(rel, include=None, exclude=None):
+    if not rel.lower().endswith(IMAGE_EXTENSIONS):
+        return False
+    match_path = rel.replace(os.sep, '/')
+    if include and not any(fnmatch(match_path, pattern) for pattern in include):
+        return False
+    return not (exclude and any(fnmatch(match_path, pattern) for pattern in exclude))
+
+def scan_images(folder, recursive=False, include=None, exclude=None, symlinks='files', archives=False,
+                shard=None):
+    """Потокове сканування зображень через os.scandir; symlinks: 'skip', 'files' або 'follow';
+    archives додає зображення з zip/tar як 'архів:член'; shard (індекс, кількість) лишає тільки файли цього шарду"""
+    if shard is not None:
+        yield from (entry for entry in scan_images(folder, recursive, include, exclude, symlinks, archives)
+                    if in_shard(entry.path, shard))
+        return
+    stack = [('', folder)]
+    visited = set()
+    while stack:
+        rel_dir, abs_dir = stack.pop()
+        try:
+            with os.scandir(abs_dir) as it:
+                subdirs = []
+                for entry in it:
+                    rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                    try:
+                        is_link = entry.is_symlink()
+                        if is_link and symlinks == 'skip':
+                            continue
+                        if entry.is_dir(follow_symlinks=symlinks == 'follow'):
+                            if recursive and not (not rel_dir and entry.name in SKIP_DIRS):
+                                subdirs.append((rel, entry.path))
+                            continue
+                        is_archive = archives and rel.lower().endswith(ARCHIVE_EXTENSIONS)
+                        if not is_archive and not is_image_path(rel, include, exclude):
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    if is_archive:
+                        yield from scan_archive(entry.path, rel, st.st_mtime_ns, include, exclude)
+                    else:
+                        yield ImageEntry(rel, st.st_size, st.st_mtime_ns)
+        except OSError:
+            continue
+        for rel, path in reversed(subdirs):
+            if symlinks == 'follow':
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if (st.st_dev, st.st_ino) in visited:
+                    continue
+                visited.add((st.st_dev, st.st_ino))
+            stack.append((rel, path))
+
+def in_shard(path, shard):
+    """Стабільний розподіл файлів між шардами за хешем відносного шляху, однаковий на всіх хостах"""
+    index, count = shard
+    return split_bucket(path, 'shard') % count == index
+
+def split_member(path):
+    """'архів.zip:шлях/у/архіві.jpg' → (шлях архіву, член); для звичайного файлу — (path, None)"""
+    start = 0
+    while True:
+        idx = path.find(ARCHIVE_SEPARATOR, start)
+        if idx < 0:
+            return path, None
+        if path[:idx].lower().endswith(ARCHIVE_EXTENSIONS):
+            return path[:idx], path[idx + 1:]
+        start = idx + 1
+
+def local_path(path):
+    """Відносний шлях для розміщення на диску: член 'a.tar:x/y.jpg' стає a.tar/x/y.jpg (без '..' та '/' на початку)"""
+    archive, member = split_member(path)
+    if member is None:
+        return path
+    return os.path.join(archive, *(part for part in member.split('/') if part not in ('', '.', '..')))
+
+def scan_archive(path, rel, mtime_ns, include=None, exclude=None):
+    """Зображення-члени архіву у порядку архіву; розмір — розпакований, mtime — самого архіву"""
+    try:
+        if path.lower().endswith('.zip'):
+            with zipfile.ZipFile(path) as zf:
+                members = [(info.filename, info.file_size) for info in zf.infolist() if not info.is_dir()]
+        else:
+            with tarfile.open(path, 'r:*') as tar:
+                members = [(info.name, info.size) for info in tar if info.isfile()]
+    except Exception as e:
+        logger.warning("unreadable archive %s: %s", rel, e)
+        return
+    for member, size in members:
+        name = f"{rel}{ARCHIVE_SEPARATOR}{member}"
+        if is_image_path(name, include, exclude):
+            yield ImageEntry(name, size, mtime_ns)
+
+class ArchiveReader:
+    """Читання членів архівів у пам'ять: архів тримається відкритим, tar читається лише вперед,
+    тож члени слід запитувати в порядку сканування"""
+    def __init__(self):
+        self.path = None
+        self.archive = None
+        self.members = {}
+
+    def open(self, path):
+        self.close()
+        self.archive = zipfile.ZipFile(path) if path.lower().endswith('.zip') else tarfile.open(path, 'r:*')
+        self.path = path
+
+    def read(self, path, member):
+        if path != self.path:
+            self.open(path)
+        if isinstance(self.archive, zipfile.ZipFile):
+            return self.archive.read(member)
+        info = self.members.get(member)
+        while info is None:
+            following = self.archive.next()
+            if following is None:
+                raise KeyError(f"{member} немає в архіві {path}")
+            self.members[following.name] = following
+            info = self.members.get(member)
+        return self.archive.extractfile(info).read()
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+        self.path = None
+        self.archive = None
+        self.members = {}
+
+def open_source(path):
+    """Те, що приймає Image.open: сам шлях або BytesIO з вмістом члена архіву 'архів:член'"""
+    archive, member = split_member(path)
+    if member is None:
+        return path
+    reader = ArchiveReader()
+    try:
+        return io.BytesIO(reader.read(archive, member))
+    finally:
+        reader.close()
+
+class ImageSnapshot:
+    """Спільний знімок папки: заповнюється під час ітерації, тож обробка починається до завершення сканування"""
+    def __init__(self, folder, **scan_options):
+        self.folder = folder
+        self.entries = EntryTable()
+        self.complete = False
+        self.partial = scan_options.get('shard') is not None
+        self._scanner = scan_images(folder, **scan_options)
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        idx = 0
+        while True:
+            with self._lock:
+                if idx >= len(self.entries):
+                    if self.complete:
+                        return
+                    entry = next(self._scanner, None)
+                    if entry is None:
+                        self.complete = True
+                        return
+                    self.entries.append(entry)
+                else:
+                    entry = self.entries[idx]
+            yield entry
+            idx += 1
+
+    def __len__(self):
+        return len(self.load().entries)
+
+    def load(self):
+        for _ in self:
+            pass
+        return self
+
+    @property
+    def paths(self):
+        return [entry.path for entry in self.load().entries]
+
+    def discard(self, paths):
+        paths = set(paths)
+        if not paths:
+            return
+        with self._lock:
+            self.entries = EntryTable(entry for entry in self.entries if entry.path not in paths)
+
+def cache_key(algorithm, fast_decode=True, max_pixels=MAX_HASH_PIXELS):
+    """Ключ кешу: алгоритм, а для повного декодування чи іншого ліміту пікселів — ще й вони,
+    бо швидке й повне декодування дають хеші, що різняться на кілька бітів"""
+    if fast_decode and max_pixels == MAX_HASH_PIXELS:
+        return algorithm
+    return f"{algorithm}/{'fast' if fast_decode else 'full'}/{max_pixels}"
+
+def connect_cache(image_dir, **options):
+    """З'єднання з кешем папки. Кеш спільний для паралельних процесів (hash-shard), тож WAL, щоб читання
+    не чекали на запис, і довге очікування блокування замість помилки «database is locked»"""
+    conn = sqlite3.connect(os.path.join(image_dir, CACHE_FILE), timeout=CACHE_LOCK_TIMEOUT, **options)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+def sql_path(path):
+    """Шлях для SQLite: ім'я, що не є коректним UTF-8 (os.scandir повертає його з суррогатами),
+    зберігається як BLOB з початковими байтами"""
+    try:
+        path.encode('utf-8')
+        return path
+    except UnicodeEncodeError:
+        return path.encode('utf-8', 'surrogateescape')
+
+def path_from_sql(value):
+    return value.decode('utf-8', 'surrogateescape') if isinstance(value, bytes) else value
+
+class HashCache:
+    """Кеш перцептивних хешів у SQLite, ключ — відносний шлях і алгоритм з режимом декодування,
+    перевірка — розмір і mtime.
+
+    У пам'яті записи зберігаються компактно: шляхи в PathTable, підписи в HashArray, пошук — двійковим
+    пошуком за відсортованими хешами шляхів. Пам'ять відображає кеш на момент відкриття: нові записи put
+    одразу йдуть у SQLite і в пам'яті оновлюють лише вже відомі шляхи.
+    """
+    def __init__(self, image_dir, rebuild=False, algorithm=DEFAULT_ALGORITHM, fast_decode=True,
+                 max_pixels=MAX_HASH_PIXELS):
+        self.image_dir = image_dir
+        self.names = algorithm
+        self.algorithm = cache_key(algorithm, fast_decode, max_pixels)
+        self.conn = connect_cache(image_dir)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(hashes)")]
+        if columns and 'algorithm' not in columns:
+            self.conn.execute("ALTER TABLE hashes RENAME TO hashes_phash")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS hashes (path TEXT, algorithm TEXT, size INTEGER, "
+                          "mtime_ns INTEGER, hash TEXT, PRIMARY KEY (path, algorithm))")
+        if columns and 'algorithm' not in columns:
+            self.conn.execute("INSERT INTO hashes SELECT path, 'phash', size, mtime_ns, hash FROM hashes_phash")
+            self.conn.execute("DROP TABLE hashes_phash")
+            self.conn.commit()
+        self.conn.execute("CREATE TABLE IF NOT EXISTS thumbs (path TEXT, tsize INTEGER, size INTEGER, "
+                          "mtime_ns INTEGER, data BLOB, PRIMARY KEY (path, tsize))")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS scans (algorithm TEXT PRIMARY KEY, complete INTEGER, "
+                          "checkpoint REAL)")
+        if rebuild:
+            self.conn.execute("DELETE FROM hashes")
+            self.conn.execute("DELETE FROM thumbs")
+            self.conn.execute("DELETE FROM scans")
+            self.conn.commit()
+        self.load()
+        self.pending = []
+        self.pending_thumbs = []
+        self.thumbs_written = 0
+        self.checkpoints = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        import numpy as np
+        self.paths = PathTable()
+        self.sizes = array('q')
+        self.mtimes = array('q')
+        self.signatures = HashArray(len(self.names.split('+')))
+        self.removed = set()
+        keys = array('q')
+        cursor = self.conn.execute("SELECT path, size, mtime_ns, hash FROM hashes WHERE algorithm = ?",
+                                   (self.algorithm,))
+        while True:
+            rows = cursor.fetchmany(1 << 16)
+            if not rows:
+                break
+            paths = [path_from_sql(row[0]) for row in rows]
+            self.paths.extend(paths)
+            self.sizes.extend([row[1] for row in rows])
+            self.mtimes.extend([row[2] for row in rows])
+            if self.signatures.width == 1:
+                self.signatures.extend([int(row[3], 16) if row[3] else None for row in rows])
+            else:
+                self.signatures.extend([parse_signature(row[3]) if row[3] else None for row in rows])
+            keys.extend(map(hash, paths))
+        keys = np.frombuffer(keys, dtype=np.int64)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        # кошики за старшими бітами ключа: starts[b] — перша позиція кошика b у відсортованих ключах,
+        # тож пошук переглядає кілька ключів замість двійкового пошуку
+        bits = max(len(keys).bit_length() - 2, 1)
+        self.shift = 64 - bits
+        lows = (np.arange(1 << bits, dtype=np.uint64) << np.uint64(self.shift)) ^ np.uint64(1 << 63)
+        starts = np.append(np.searchsorted(keys, lows.view(np.int64)), len(keys))
+        # масиви array, а не NumPy: індексація по одному елементу з Python у них у кілька разів швидша
+        self.order = array('q', order.tobytes())
+        self.keys = array('q', keys.tobytes())
+        self.starts = array('q', starts.astype(np.int64).tobytes())
+
+    def find(self, path):
+        """Номер запису шляху в пам'яті або None"""
+        key = hash(path)
+        bucket = (key + (1 << 63)) >> self.shift
+        keys = self.keys
+        for pos in range(self.starts[bucket], self.starts[bucket + 1]):
+            if keys[pos] == key:
+                idx = self.order[pos]
+                if idx not in self.removed and self.paths[idx] == path:
+                    return idx
+        return None
+
+    def record(self, path):
+        """(розмір, mtime, хеш) збереженого запису або None; хеш '' — файл не читається"""
+        idx = self.find(path)
+        if idx is None:
+            return None
+        return self.sizes[idx], self.mtimes[idx], self.hex(idx)
+
+    def hex(self, idx):
+        signature = self.signatures.get(idx)
+        return '' if signature is None else format_signature(signature, self.names)
+
+    def fresh(self, path, size, mtime_ns):
+        """Номер актуального запису (той самий розмір і mtime) або None; рахує влучання й промахи"""
+        idx = self.find(path)
+        if idx is not None and self.sizes[idx] == size and self.mtimes[idx] == mtime_ns:
+            self.hits += 1
+            return idx
+        self.misses += 1
+        return None
+
+    def get(self, path, size, mtime_ns):
+        idx = self.fresh(path, size, mtime_ns)
+        return None if idx is None else self.hex(idx)
+
+    def put(self, path, size, mtime_ns, h):
+        idx = self.find(path)
+        if idx is not None:
+            self.sizes[idx] = size
+            self.mtimes[idx] = mtime_ns
+            if h:
+                self.signatures.set(idx, parse_signature(h))
+            else:
+                self.signatures.clear(idx)
+        self.pending.append((sql_path(path), self.algorithm, size, mtime_ns, h))
+
+    def put_thumbnails(self, path, size, mtime_ns, thumbs):
+        path = sql_path(path)
+        self.pending_thumbs.extend((path, tsize, size, mtime_ns, data) for tsize, data in thumbs.items())
+
+    def copy_thumbnails(self, src, dst, size, mtime_ns):
+        """Мініатюри точної копії беруться з оригіналу без повторного декодування"""
+        self.write_pending()
+        src, dst = sql_path(src), sql_path(dst)
+        self.conn.execute("DELETE FROM thumbs WHERE path = ?", (dst,))
+        self.conn.execute("INSERT INTO thumbs SELECT ?, tsize, ?, ?, data FROM thumbs "
+                          "WHERE path = ? AND size = ?", (dst, size, mtime_ns, src, size))
+
+    def move(self, old_path, new_path):
+        self.write_pending()
+        idx = self.find(old_path)
+        if idx is not None:
+            self.removed.add(idx)
+        old_path, new_path = sql_path(old_path), sql_path(new_path)
+        if self.conn.execute("SELECT 1 FROM hashes WHERE path = ? LIMIT 1", (old_path,)).fetchone():
+            self.conn.execute("DELETE FROM hashes WHERE path = ?", (new_path,))
+            self.conn.execute("UPDATE hashes SET path = ? WHERE path = ?", (new_path, old_path))
+        self.conn.execute("DELETE FROM thumbs WHERE path = ?", (new_path,))
+        self.conn.execute("UPDATE thumbs SET path = ? WHERE path = ?", (new_path, old_path))
+
+    def prune(self, seen):
+        """Видалення записів файлів, яких немає серед seen (ітерованих шляхів). Замість множини шляхів
+        тримаються лише їхні відсортовані 64-бітні хеші; випадковий збіг хешів лише лишає зайвий запис"""
+        import numpy as np
+        self.write_pending()
+        dup_prefix = DUPLICATE_DIR + os.sep
+        seen = np.sort(np.fromiter((hash(path) for path in seen), dtype=np.int64))
+        stale = []
+        cursor = self.conn.execute("SELECT DISTINCT path FROM hashes")
+        while True:
+            paths = [path_from_sql(path) for path, in cursor.fetchmany(1 << 16)]
+            if not paths:
+                break
+            keys = np.fromiter((hash(path) for path in paths), dtype=np.int64, count=len(paths))
+            found = seen[np.minimum(seen.searchsorted(keys), len(seen) - 1)] == keys if len(seen) else keys != keys
+            stale.extend(path for path, known in zip(paths, found.tolist()) if not known and not (
+                path.startswith(dup_prefix) and os.path.exists(os.path.join(self.image_dir, path))))
+        for path in stale:
+            idx = self.find(path)
+            if idx is not None:
+                self.removed.add(idx)
+        self.conn.executemany("DELETE FROM hashes WHERE path = ?", ((sql_path(path),) for path in stale))
+        self.conn.executemany("DELETE FROM thumbs WHERE path = ?", ((sql_path(path),) for path in stale))
+
+    def write_pending(self):
+        if self.pending:
+            self.conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)", self.pending)
+            self.pending = []
+        if self.pending_thumbs:
+            self.conn.executemany("INSERT OR REPLACE INTO thumbs VALUES (?, ?, ?, ?, ?)", self.pending_thumbs)
+            self.thumbs_written += len(self.pending_thumbs)
+            self.pending_thumbs = []
+
+    def flush(self):
+        self.write_pending()
+        self.conn.commit()
+
+    def begin_scan(self):
+        """Позначити сканування незавершеним; True, якщо попереднє сканування цим алгоритмом було перерване"""
+        row = self.conn.execute("SELECT complete FROM scans WHERE algorithm = ?", (self.algorithm,)).fetchone()
+        self.conn.execute("INSERT OR REPLACE INTO scans VALUES (?, 0, ?)", (self.algorithm, time.time()))
+        self.conn.commit()
+        return row is not None and not row[0]
+
+    def checkpoint(self):
+        """Зафіксувати обчислені хеші на диску, щоб після зупинки чи збою не рахувати їх знову"""
+        self.write_pending()
+        self.conn.execute("UPDATE scans SET checkpoint = ? WHERE algorithm = ?", (time.time(), self.algorithm))
+        self.conn.commit()
+        self.checkpoints += 1
+
+    def end_scan(self):
+        self.conn.execute("UPDATE scans SET complete = 1, checkpoint = ? WHERE algorithm = ?",
+                          (time.time(), self.algorithm))
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'cache_hits': self.hits,
+            'cache_misses': self.misses,
+            'cache_hit_rate': self.hits / total if total else 0.0,
+            'thumbnails_stored': self.thumbs_written,
+            'checkpoints': self.checkpoints,
+        }
+
+class ThumbnailStore:
+    """Читання збережених мініатюр з кешу папки; безпечне для фонових потоків"""
+    def __init__(self, image_dir):
+        self.image_dir = image_dir
+        db_path = os.path.join(image_dir, CACHE_FILE)
+        self.conn = connect_cache(image_dir, check_same_thread=False) if os.path.exists(db_path) else None
+        self.lock = threading.Lock()
+
+    def get(self, path, min_size):
+        """Найменша актуальна мініатюра не менша за min_size: пара (розмір, зображення) або None"""
+        if self.conn is None:
+            return None
+        from PIL import Image
+        try:
+            archive, member = split_member(path)
+            st = os.stat(archive)
+            size = st.st_size if member is None else None
+            with self.lock:
+                row = self.conn.execute(
+                    "SELECT tsize, data FROM thumbs WHERE path = ? AND (? IS NULL OR size = ?) AND mtime_ns = ? "
+                    "AND tsize >= ? ORDER BY tsize LIMIT 1",
+                    (sql_path(os.path.relpath(path, self.image_dir)), size, size, st.st_mtime_ns, min_size)).fetchone()
+        except (OSError, sqlite3.Error):
+            return None
+        if row is None:
+            return None
+        img = Image.open(io.BytesIO(row[1]))
+        img.load()
+        return row[0], img
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+def reduce_for_hash(img, size=HASH_DECODE_SIZE, mode='L'):
+    """Зменшене декодування: масштабування в DCT-домені для JPEG, reduce() для інших форматів"""
+    if img.format == 'JPEG':
+        img.draft(mode, (size, size))
+        return img
+    factor = min(img.size) // size
+    if mode == 'L':
+        img = img.convert('L')
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img
+
+def pack_bits(bits):
+    """Булева матриця (кількість, біти ≤ 64) → масив uint64 з тим самим порядком бітів, що й у imagehash"""
+    import numpy as np
+    bits = np.asarray(bits, dtype=bool).reshape(len(bits), -1)
+    if bits.shape[1] < 64:
+        bits = np.pad(bits, ((0, 0), (64 - bits.shape[1], 0)))
+    return np.packbits(bits, axis=1).view('>u8').reshape(-1).astype(np.uint64)
+
+class HashEngine:
+    """Перцептивні хеші та їх комбінації: підготовка кожного зображення окремо, хешування всієї пачки векторно"""
+    def __init__(self, algorithm=DEFAULT_ALGORITHM):
+        self.algorithms = tuple(algorithm.split('+'))
+        unknown = [name for name in self.algorithms if name not in HASH_ALGORITHMS]
+        if unknown or len(set(self.algorithms)) != len(self.algorithms):
+            raise ValueError(f"Невідомий алгоритм хешування: {algorithm}")
+        self.name = '+'.join(self.algorithms)
+        self.mode = 'RGB' if 'colorhash' in self.algorithms else 'L'
+
+    def prepare(self, img):
+        return tuple(getattr(self, 'prepare_' + name)(img) for name in self.algorithms)
+
+    def hash_arrays(self, prepared):
+        """Упаковані хеші пачки: масив uint64 форми (кількість зображень, кількість алгоритмів)"""
+        import numpy as np
+        return np.stack([getattr(self, 'batch_' + name)([arrays[i] for arrays in prepared])
+                         for i, name in enumerate(self.algorithms)], axis=1)
+
+    def signatures(self, prepared):
+        """Шістнадцяткові підписи для кешу; компоненти комбінованого підпису розділені ':'"""
+        widths = [HASH_HEX_WIDTH[name] for name in self.algorithms]
+        return [':'.join(format(int(value), f'0{width}x') for value, width in zip(row, widths))
+                for row in self.hash_arrays(prepared)]
+
+    @staticmethod
+    def resize_gray(img, size):
+        from PIL import Image
+        import numpy as np
+        return np.asarray(img.convert('L').resize(size, Image.Resampling.LANCZOS))
+
+    def prepare_ahash(self, img):
+        return self.resize_gray(img, (8, 8))
+
+    def prepare_dhash(self, img):
+        return self.resize_gray(img, (9, 8))
+
+    def prepare_phash(self, img):
+        return self.resize_gray(img, (32, 32))
+
+    def prepare_whash(self, img):
+        import numpy as np
+        scale = max(2 ** int(np.log2(min(img.size))), 8)
+        return self.resize_gray(img, (scale, scale)) / 255.
+
+    def prepare_colorhash(self, img, binbits=3):
+        """Гістограма яскравості, насиченості й відтінку рахується на кожному зображенні окремо"""
+        import numpy as np
+        intensity = np.asarray(img.convert('L')).flatten()
+        h, s, _ = [np.asarray(band).flatten() for band in img.convert('HSV').split()]
+        mask_black = intensity < 256 // 8
+        mask_gray = s < 256 // 3
+        mask_colors = ~mask_black & ~mask_gray
+        mask_faint = mask_colors & (s < 256 * 2 // 3)
+        mask_bright = mask_colors & (s > 256 * 2 // 3)
+        colors = max(1, mask_colors.sum())
+        hue_bins = np.linspace(0, 255, 6 + 1)
+        faint = np.histogram(h[mask_faint], bins=hue_bins)[0] if mask_faint.any() else np.zeros(6)
+        bright = np.histogram(h[mask_bright], bins=hue_bins)[0] if mask_bright.any() else np.zeros(6)
+        maxvalue = 2 ** binbits
+        values = [min(maxvalue - 1, int(mask_black.mean() * maxvalue)),
+                  min(maxvalue - 1, int((~mask_black & mask_gray).mean() * maxvalue))]
+        values += [min(maxvalue - 1, int(count * maxvalue * 1. / colors)) for count in list(faint) + list(bright)]
+        return np.array([value // (2 ** (binbits - i - 1)) % 2 ** (binbits - i) > 0
+                         for value in values for i in range(binbits)])
+
+    @staticmethod
+    def batch_ahash(arrays):
+        import numpy as np
+        pixels = np.stack(arrays).reshape(len(arrays), -1)
+        return pack_bits(pixels > pixels.mean(axis=1)[:, None])
+
+    @staticmethod
+    def batch_dhash(arrays):
+        import numpy as np
+        pixels = np.stack(arrays)
+        return pack_bits((pixels[:, :, 1:] > pixels[:, :, :-1]).reshape(len(arrays), -1))
+
+    @staticmethod
+    def batch_phash(arrays):
+        import numpy as np
+        import scipy.fftpack
+        dct = scipy.fftpack.dct(scipy.fftpack.dct(np.stack(arrays), axis=1), axis=2)
+        low = dct[:, :8, :8].reshape(len(arrays), -1)
+        return pack_bits(low > np.median(low, axis=1)[:, None])
+
+    @staticmethod
+    def batch_whash(arrays):
+        """Вейвлети Хаара для пачки однакових розмірів; різні масштаби обробляються окремими пачками"""
+        import numpy as np
+        import pywt
+        result = np.zeros(len(arrays), dtype=np.uint64)
+        by_scale = defaultdict(list)
+        for idx, pixels in enumerate(arrays):
+            by_scale[pixels.shape[0]].append(idx)
+        for scale, indices in by_scale.items():
+            pixels = np.stack([arrays[idx] for idx in indices])
+            max_level = int(np.log2(scale))
+            coeffs = list(pywt.wavedec2(pixels, 'haar', level=max_level, axes=(1, 2)))
+            coeffs[0] *= 0
+            pixels = pywt.waverec2(coeffs, 'haar', axes=(1, 2))
+            low = pywt.wavedec2(pixels, 'haar', level=max_level - 3, axes=(1, 2))[0].reshape(len(indices), -1)
+            result[indices] = pack_bits(low > np.median(low, axis=1)[:, None])
+        return result
+
+    @staticmethod
+    def batch_colorhash(arrays):
+        import numpy as np
+        return pack_bits(np.stack(arrays))
+
+_engines = {}
+
+def get_engine(algorithm):
+    engine = _engines.get(algorithm)
+    if engine is None:
+        engine = _engines[algorithm] = HashEngine(algorithm)
+    return engine
+
+def parse_signature(h):
+    """Підпис з кешу → int для одного алгоритму або кортеж int для комбінованого"""
+    parts = [int(part, 16) for part in h.split(':')]
+    return parts[0] if len(parts) == 1 else tuple(parts)
+
+def format_signature(signature, algorithm=DEFAULT_ALGORITHM):
+    """Зворотне до parse_signature: int або кортеж int → шістнадцятковий підпис для кешу"""
+    parts = signature if isinstance(signature, tuple) else (signature,)
+    return ':'.join(format(value, f'0{HASH_HEX_WIDTH[name]}x') for value, name in zip(parts, algorithm.split('+')))
+
+def thumbnail_format():
+    from PIL import features
+    return 'WEBP' if features.check('webp') else 'JPEG'
+
+def encode_thumbnails(img, sizes):
+    """Стиснуті мініатюри фіксованих розмірів; кожна наступна зменшується з попередньої"""
+    fmt = thumbnail_format()
+    if img.mode not in ('RGB', 'L') and not (fmt == 'WEBP' and img.mode == 'RGBA'):
+        img = img.convert('RGBA' if fmt == 'WEBP' and 'transparency' in img.info else 'RGB')
+    thumbs = {}
+    for size in sorted(sizes, reverse=True):
+        img = img.copy()
+        img.thumbnail((size, size))
+        buf = io.BytesIO()
+        img.save(buf, fmt, quality=THUMB_QUALITY)
+        thumbs[size] = buf.getvalue()
+    return thumbs
+
+def load_for_hash(source, engine, fast_decode, max_pixels, thumb_sizes, timings):
+    """Декодування одного файлу (шлях або вміст у bytes): мініатюри та підготовлені для хешування масиви
+    (None — завелике)"""
+    from PIL import Image
+    if Image.MAX_IMAGE_PIXELS is not None and (not max_pixels or max_pixels > Image.MAX_IMAGE_PIXELS):
+        # власний захист PIL спрацьовує ще в open (понад ~179 Мп), тож межу задає max_pixels
+        Image.MAX_IMAGE_PIXELS = max_pixels or None
+        warnings.filterwarnings('ignore', category=Image.DecompressionBombWarning)
+    clock = time.perf_counter
+    start = clock()
+    try:
+        img = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    except Image.DecompressionBombError:
+        return {}, None
+    with img:
+        if timings is not None:
+            timings['open'] = clock() - start
+        if max_pixels and img.width * img.height > max_pixels:
+            return {}, None
+        thumbs = {}
+        if thumb_sizes:
+            if fast_decode and img.format == 'JPEG':
+                largest = max(thumb_sizes)
+                img.draft('RGB', (largest, largest))
+            start = clock()
+            img.load()
+            if timings is not None:
+                timings['decode'] = clock() - start
+            start = clock()
+            try:
+                thumbs = encode_thumbnails(img, thumb_sizes)
+            except Exception:
+                pass
+            if timings is not None:
+                timings['thumbnail'] = clock() - start
+        start = clock()
+        if fast_decode:
+            img = reduce_for_hash(img, mode=engine.mode)
+        img.load()
+        if timings is not None:
+            timings['decode'] = timings.get('decode', 0.0) + clock() - start
+        start = clock()
+        arrays = engine.prepare(img)
+        if timings is not None:
+            timings['resize'] = clock() - start
+        return thumbs, arrays
+
+def hash_batch(paths, algorithm=DEFAULT_ALGORITHM, fast_decode=True, max_pixels=MAX_HASH_PIXELS,
+               thumb_sizes=(), timed=False, stop_flag=None):
+    """Хешування пачки файлів (шляхів або вмісту в bytes); timed додає тривалість етапів,
+    час векторного хешування ділиться порівну. Після зупинки через stop_flag решта файлів пропускається,
+    і результатів стає менше, ніж шляхів"""
+    engine = get_engine(algorithm)
+    results = []
+    prepared = []
+    slots = []
+    for path in paths:
+        if stop_flag is not None and stop_flag['stop']:
+            break
+        timings = {} if timed else None
+        try:
+            thumbs, arrays = load_for_hash(path, engine, fast_decode, max_pixels, thumb_sizes, timings)
+        except Exception:
+            results.append(HashResult('', {}, timings))
+            continue
+        if arrays is not None:
+            slots.append(len(results))
+            prepared.append(arrays)
+        results.append(HashResult(None, thumbs, timings))
+    if prepared:
+        start = time.perf_counter()
+        signatures = engine.signatures(prepared)
+        share = (time.perf_counter() - start) / len(prepared)
+        for idx, signature in zip(slots, signatures):
+            if timed:
+                results[idx].timings['hash'] = share
+            results[idx] = results[idx]._replace(hash=signature)
+    return results
+
+def hash_file(path, **hash_options):
+    return hash_batch([path], **hash_options)[0]
+
+def hash_image(path, fast_decode=True, max_pixels=MAX_HASH_PIXELS, algorithm=DEFAULT_ALGORITHM):
+    return hash_file(path, algorithm=algorithm, fast_decode=fast_decode, max_pixels=max_pixels).hash
+
+def _hash_chunk(items, hash_options, stop_flag=None):
+    keys, paths = zip(*items)
+    return list(zip(keys, hash_batch(paths, stop_flag=stop_flag, **hash_options)))
+
+def iter_hashes(items, stop_flag, workers=1, chunk_size=HASH_CHUNK_SIZE, hash_options=None):
+    """Хешування потоку пар (ключ, шлях); повертає пари (ключ, HashResult) у порядку завершення"""
+    hash_options = hash_options or {}
+    items = iter(items)
+    if workers <= 1:
+        while not stop_flag['stop']:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                return
+            yield from _hash_chunk(chunk, hash_options, stop_flag)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        def submit_next():
+            chunk = list(islice(items, chunk_size))
+            if chunk:
+                pending.add(pool.submit(_hash_chunk, chunk, hash_options))
+
+        for _ in range(workers * 2):
+            submit_next()
+        while pending and not stop_flag['stop']:
+            done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                yield from future.result()
+                submit_next()
+    finally:
+        pool.shutdown(wait=not stop_flag['stop'], cancel_futures=True)
+
+class MultiIndexHash:
+    """Мультиіндексне хешування: пошук хешів у межах відстані Геммінга без перебору всіх пар"""
+    def __init__(self, radius, bits=64, expected_size=0):
+        self.radius = radius
+        blocks = self.choose_blocks(radius, bits, expected_size)
+        self.blocks = []
+        self.probes = []
+        start = 0
+        for i in range(blocks):
+            width = bits // blocks + (1 if i < bits % blocks else 0)
+            self.blocks.append((start, (1 << width) - 1))
+            self.probes.append(self.flip_masks(width, radius // blocks))
+            start += width
+        self.tables = [defaultdict(list) for _ in self.blocks]
+
+    @staticmethod
+    def flip_masks(width, radius):
+        masks = [0]
+        for count in range(1, radius + 1):
+            for positions in combinations(range(width), count):
+                masks.append(sum(1 << p for p in positions))
+        return masks
+
+    @staticmethod
+    def choose_blocks(radius, bits, expected_size):
+        best, best_cost = 1, None
+        for blocks in range(1, min(radius + 1, bits // 8) + 1):
+            width = bits // blocks
+            probes = sum(comb(width, i) for i in range(radius // blocks + 1))
+            cost = blocks * probes * (1 + expected_size / (1 << width))
+            if best_cost is None or cost < best_cost:
+                best, best_cost = blocks, cost
+        return best
+
+    def add(self, value):
+        for (start, mask), table in zip(self.blocks, self.tables):
+            table[(value >> start) & mask].append(value)
+
+    def search(self, value):
+        found = set()
+        for (start, mask), probes, table in zip(self.blocks, self.probes, self.tables):
+            key = (value >> start) & mask
+            for probe in probes:
+                for other in table.get(key ^ probe, ()):
+                    if other not in found and (value ^ other).bit_count() <= self.radius:
+                        found.add(other)
+        return found
+
+class HashArray:
+    """Підписи в масиві uint64 (рядок на файл, стовпчик на компонент комбінованого підпису) з позначкою наявності.
+    Під час сканування рядки дописуються в array('Q'); групування бачить той самий буфер як масив NumPy
+    і виконується векторним сортуванням і проходом по серіях однакових значень замість словників"""
+    def __init__(self, width=1):
+        self.width = width
+        self.empty = (0,) * width
+        self.values = array('Q')
+        self.valid = bytearray()
+
+    def __len__(self):
+        return len(self.valid)
+
+    def append(self, signature=None):
+        """Новий рядок (None — підпису ще немає); повертає його номер"""
+        if signature is None:
+            self.values.extend(self.empty)
+            self.valid.append(0)
+        else:
+            if self.width == 1:
+                self.values.append(signature)
+            else:
+                self.values.extend(signature)
+            self.valid.append(1)
+        return len(self.valid) - 1
+
+    def extend(self, signatures):
+        """Дописати кілька рядків; signatures — список, None — підпису немає"""
+        if self.width == 1:
+            self.values.extend([0 if signature is None else signature for signature in signatures])
+        else:
+            for signature in signatures:
+                self.values.extend(self.empty if signature is None else signature)
+        self.valid.extend([signature is not None for signature in signatures])
+
+    def set(self, idx, signature):
+        if self.width == 1:
+            self.values[idx] = signature
+        else:
+            self.values[idx * self.width:(idx + 1) * self.width] = array('Q', signature)
+        self.valid[idx] = 1
+
+    def clear(self, idx):
+        self.valid[idx] = 0
+
+    def get(self, idx):
+        if not self.valid[idx]:
+            return None
+        if self.width == 1:
+            return self.values[idx]
+        return tuple(self.values[idx * self.width:(idx + 1) * self.width])
+
+    def rows(self):
+        return [idx for idx, flag in enumerate(self.valid) if flag]
+
+    def labels(self, values, threshold):
+        """Мітка кластера для кожного рядка за порогу > 0: унікальні підписи об'єднуються через мультиіндекс"""
+        import numpy as np
+        if self.width == 1:
+            unique, inverse = np.unique(values[:, 0], return_inverse=True)
+            firsts, rests = unique.tolist(), None
+        else:
+            unique, inverse = np.unique(values, axis=0, return_inverse=True)
+            firsts = unique[:, 0].tolist()
+            rests = [tuple(row) for row in unique[:, 1:].tolist()]
+        parent = list(range(len(firsts)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        index = MultiIndexHash(threshold, expected_size=len(firsts))
+        by_first = defaultdict(list)
+        for i, first in enumerate(firsts):
+            for other_first in index.search(first):
+                for j in by_first[other_first]:
+                    if rests is not None and any((a ^ b).bit_count() > threshold
+                                                 for a, b in zip(rests[i], rests[j])):
+                        continue
+                    root_a, root_b = find(i), find(j)
+                    if root_a != root_b:
+                        parent[root_b] = root_a
+            if first not in by_first:
+                index.add(first)
+            by_first[first].append(i)
+        roots = np.array([find(i) for i in range(len(firsts))], dtype=np.int64)
+        return roots[inverse.reshape(-1)]
+
+    def groups(self, threshold=0, name_of=str):
+        """Групи з двох і більше рядків, відсортовані як у group_hashes; name_of перетворює номер рядка на ім'я"""
+        import numpy as np
+        rows = np.flatnonzero(np.frombuffer(self.valid, dtype=np.uint8))
+        values = np.frombuffer(self.values, dtype=np.uint64).reshape(-1, self.width)[rows]
+        if threshold > 0:
+            keys = self.labels(values, threshold)
+            order = np.argsort(keys, kind='stable')
+            keys = keys[order]
+            change = keys[1:] != keys[:-1]
+        else:
+            order = np.argsort(values[:, 0], kind='stable') if self.width == 1 else np.lexsort(values.T[::-1])
+            keys = values[order]
+            change = (keys[1:] != keys[:-1]).any(axis=1)
+        sizes = np.diff(np.concatenate(([0], np.flatnonzero(change) + 1, [len(order)])))
+        keep = sizes > 1
+        members = rows[order[np.repeat(keep, sizes)]].tolist()
+        bounds = np.concatenate(([0], np.cumsum(sizes[keep]))).tolist()
+        return sorted(sorted(name_of(idx) for idx in members[start:end]) for start, end in zip(bounds, bounds[1:]))
+
+def group_hashes(entries, threshold=0):
+    """Групування пар (ім'я, хеш) у групи дублікатів з об'єднанням транзитивних збігів.
+
+    Хеш — int або кортеж int (комбінований підпис): тоді індексується перший компонент,
+    а збігом вважаються лише підписи, у яких усі компоненти в межах порогу.
+    """
+    paths = PathTable()
+    table = None
+    for name, h in entries:
+        if table is None:
+            table = HashArray(len(h) if isinstance(h, tuple) else 1)
+        paths.append(name)
+        table.append(h)
+    return [] if table is None else table.groups(threshold, paths.__getitem__)
+
+def file_digest(path, limit=None):
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            block = f.read(DIGEST_BLOCK_SIZE if remaining is None else min(DIGEST_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.digest()
+
+class ExactMatcher:
+    """Потоковий пошук побайтових копій: розмір → хеш початку файлу → хеш усього вмісту.
+    path_of(ключ) дає шлях файлу на вимогу, щоб не тримати шляхи всіх файлів"""
+    def __init__(self, path_of=None):
+        self.path_of = path_of
+        self.by_size = {}
+        self.paths = {}
+        self.heads = {}
+        self.fulls = {}
+        self.stats = {'prepass_size': 0, 'prepass_head': 0, 'prepass_full': 0, 'prepass_exact': 0}
+
+    def path(self, key):
+        return self.paths[key] if self.path_of is None else self.path_of(key)
+
+    def head(self, key):
+        if key not in self.heads:
+            self.heads[key] = file_digest(self.path(key), HEAD_DIGEST_SIZE)
+        return self.heads[key]
+
+    def full(self, key):
+        if key not in self.fulls:
+            self.fulls[key] = file_digest(self.path(key))
+        return self.fulls[key]
+
+    def match(self, key, source, size):
+        """Повертає ключ раніше побаченої ідентичної копії або None; source — шлях або вміст члена архіву"""
+        if isinstance(source, bytes):
+            self.heads[key] = hashlib.blake2b(source[:HEAD_DIGEST_SIZE], digest_size=16).digest()
+            self.fulls[key] = hashlib.blake2b(source, digest_size=16).digest()
+        elif self.path_of is None:
+            self.paths[key] = source
+        try:
+            original = self._find(key, size)
+        except OSError:
+            original = None
+        if original is None:
+            self.by_size.setdefault(size, []).append(key)
+        return original
+
+    def _find(self, key, size):
+        candidates = self.by_size.get(size)
+        if not candidates:
+            self.stats['prepass_size'] += 1
+            return None
+        head = self.head(key)
+        candidates = [other for other in candidates if self.head(other) == head]
+        if not candidates:
+            self.stats['prepass_head'] += 1
+            return None
+        full = self.full(key)
+        for other in candidates:
+            if self.full(other) == full:
+                self.stats['prepass_exact'] += 1
+                return other
+        self.stats['prepass_full'] += 1
+        return None
+
+class ProgressChannel:
+    """Канал прогресу: зводить виклики progress_callback у знімки з фіксованою частотою"""
+    def __init__(self, publish, interval=PROGRESS_INTERVAL):
+        self.publish = publish
+        self.interval = interval
+        self.stage = ''
+        self.started = time.monotonic()
+        self.last_publish = 0.0
+        self.pending = None
+
+    def __call__(self, text, current, total):
+        self.pending = (text, current, total)
+        now = time.monotonic()
+        if now - self.last_publish >= self.interval:
+            self.last_publish = now
+            self.flush()
+
+    def set_stage(self, stage):
+        self.flush()
+        self.stage = stage
+        self.started = time.monotonic()
+        if self.pending is None:
+            self.pending = ('', 0, 0)
+        self.flush()
+
+    def flush(self):
+        if self.pending is None:
+            return
+        text, current, total = self.pending
+        self.pending = None
+        elapsed = time.monotonic() - self.started
+        rate = current / elapsed if elapsed > 0 else 0.0
+        self.publish({
+            'stage': self.stage,
+            'text': text,
+            'current': current,
+            'total': total,
+            'rate': rate,
+            'eta': (total - current) / rate if rate else 0.0,
+        })
+
+def report_stage(progress_callback, stage):
+    set_stage = getattr(progress_callback, 'set_stage', None)
+    if set_stage is not None:
+        set_stage(stage)
+
+class Metrics:
+    """Метрики етапів: кількість, сумарний час, гістограма затримок і найповільніші файли"""
+    enabled = True
+
+    def __init__(self, slowest=METRICS_SLOWEST, buckets=METRICS_BUCKETS):
+        self.slowest = slowest
+        self.buckets = buckets
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds, path=None):
+        with self.lock:
+            data = self.stages.get(stage)
+            if data is None:
+                data = self.stages[stage] = {'count': 0, 'seconds': 0.0,
+                                             'buckets': [0] * (len(self.buckets) + 1), 'slowest': []}
+            data['count'] += 1
+            data['seconds'] += seconds
+            idx = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+            data['buckets'][idx] += 1
+            if path is not None and self.slowest:
+                if len(data['slowest']) < self.slowest:
+                    heapq.heappush(data['slowest'], (seconds, path))
+                elif seconds > data['slowest'][0][0]:
+                    heapq.heapreplace(data['slowest'], (seconds, path))
+
+    @contextmanager
+    def timer(self, stage, path=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, path)
+
+    def iterate(self, iterable, stage, name=None):
+        """Ітерація з виміром часу отримання кожного елемента (наприклад, сканування папки)"""
+        items = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - start, name(item) if name else None)
+            yield item
+
+    def report(self):
+        with self.lock:
+            stages = {}
+            for stage, data in self.stages.items():
+                bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+                stages[stage] = {
+                    'count': data['count'],
+                    'seconds': data['seconds'],
+                    'mean': data['seconds'] / data['count'] if data['count'] else 0.0,
+                    'histogram': dict(zip(bounds, data['buckets'])),
+                    'slowest': [{'path': path, 'seconds': seconds}
+                                for seconds, path in sorted(data['slowest'], reverse=True)],
+                }
+            return {'stages': stages}
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+
+    def write_prometheus(self, path, prefix='imagepro'):
+        """Файл для textfile-колектора node_exporter; запис атомарний через тимчасовий файл"""
+        lines = [f"# HELP {prefix}_stage_seconds Тривалість етапів обробки на один файл або операцію",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        with self.lock:
+            for stage, data in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip([str(bound) for bound in self.buckets] + ['+Inf'], data['buckets']):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {data["seconds"]}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {data["count"]}')
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp, path)
+
+class NullMetrics:
+    """Вимкнені метрики: ті самі методи без вимірювань"""
+    enabled = False
+
+    def observe(self, stage, seconds, path=None):
+        pass
+
+    def timer(self, stage, path=None):
+        return nullcontext()
+
+    def iterate(self, iterable, stage, name=None):
+        return iterable
+
+NULL_METRICS = NullMetrics()
+
+def find_duplicates(image_dir, progress_callback, stop_flag, use_cache=True, rebuild_cache=False, stats=None,
+                    workers=1, threshold=0, fast_decode=True, max_pixels=MAX_HASH_PIXELS, snapshot=None,
+                    exact_prepass=True, move_duplicates=True, thumbnails=False, metrics=None,
+                    algorithm=DEFAULT_ALGORITHM, hashes=None, checkpoint_interval=CHECKPOINT_INTERVAL):
+    if snapshot is None:
+        snapshot = ImageSnapshot(image_dir)
+    metrics = metrics or NULL_METRICS
+    algorithm = get_engine(algorithm).name
+    cache = HashCache(image_dir, rebuild=rebuild_cache, algorithm=algorithm, fast_decode=fast_decode,
+                      max_pixels=max_pixels) if use_cache else None
+    journal = MoveJournal(image_dir, cache.conn if cache is not None else None) if move_duplicates else None
+    if journal is not None and journal.entries():
+        completed = journal.complete(cache)
+        logger.warning("completed %d moves of an interrupted run", len(completed))
+        snapshot.discard(set(completed))
+        if stats is not None:
+            stats['journal_completed'] = len(completed)
+    resumed = cache.begin_scan() if cache is not None and not snapshot.partial else False
+    # знімок уже тримає записи компактно, а номер файлу — його позиція у знімку
+    files = snapshot.entries
+    matcher = ExactMatcher(lambda idx: os.path.join(image_dir, files.paths[idx])) if exact_prepass else None
+    reader = ArchiveReader()
+    results = HashArray(len(get_engine(algorithm).algorithms))
+    unreadable = set()
+    copies = {}
+    progress = {'checked': 0, 'skipped': 0}
+    report_stage(progress_callback, 'hash')
+
+    def report():
+        total = len(snapshot.entries)
+        progress_callback(f"Перевірено {progress['checked']}/{total} файлів", progress['checked'], total)
+
+    def to_hash():
+        for idx, entry in enumerate(metrics.iterate(snapshot, 'list', lambda entry: entry.path)):
+            if stop_flag['stop']:
+                return
+            cached = cache.fresh(entry.path, entry.size, entry.mtime_ns) if cache is not None else None
+            if cached is not None:
+                signature = cache.signatures.get(cached)
+                results.append(signature)
+                if signature is None:
+                    unreadable.add(idx)
+            else:
+                results.append()
+                source = os.path.join(image_dir, entry.path)
+                archive, member = split_member(entry.path)
+                if member is not None:
+                    # Члени архіву читаються тут послідовно, поки процеси хешують попередні пачки
+                    with metrics.timer('read', entry.path):
+                        try:
+                            source = reader.read(os.path.join(image_dir, archive), member)
+                        except Exception:
+                            source = b''
+                original = None
+                if matcher is not None:
+                    with metrics.timer('prepass', entry.path):
+                        original = matcher.match(idx, source, entry.size)
+                if original is None:
+                    yield idx, source
+                    continue
+                copies[idx] = original
+            progress['checked'] += 1
+            if progress['checked'] % PROGRESS_BATCH == 0:
+                report()
+
+    hash_options = {'algorithm': algorithm, 'fast_decode': fast_decode, 'max_pixels': max_pixels,
+                    'thumb_sizes': THUMB_STORE_SIZES if thumbnails and cache is not None else (),
+                    'timed': metrics.enabled}
+    next_checkpoint = time.monotonic() + checkpoint_interval if checkpoint_interval else None
+    try:
+        for idx, (h, thumbs, timings) in iter_hashes(to_hash(), stop_flag, workers=workers,
+                                                     hash_options=hash_options):
+            progress['checked'] += 1
+            if timings:
+                for stage, seconds in timings.items():
+                    metrics.observe(stage, seconds, files.paths[idx])
+            logger.debug("hash %s %s", files.paths[idx], 'skipped' if h is None else h or 'unreadable')
+            if h is None:
+                progress['skipped'] += 1
+            else:
+                if h:
+                    results.set(idx, parse_signature(h))
+                else:
+                    unreadable.add(idx)
+                if cache is not None:
+                    entry = files[idx]
+                    cache.put(entry.path, entry.size, entry.mtime_ns, h)
+                    if thumbs:
+                        cache.put_thumbnails(entry.path, entry.size, entry.mtime_ns, thumbs)
+            if cache is not None and next_checkpoint is not None and time.monotonic() >= next_checkpoint:
+                with metrics.timer('cache'):
+                    cache.checkpoint()
+                next_checkpoint = time.monotonic() + checkpoint_interval
+            report()
+    except BaseException:
+        # Ctrl+C або помилка посеред хешування: уже обчислене зберігається для наступного запуску
+        reader.close()
+        if cache is not None:
+            cache.close()
+        raise
+    reader.close()
+    for idx, original in copies.items():
+        signature = results.get(original)
+        if signature is None and original not in unreadable:
+            progress['skipped'] += 1
+            continue
+        if signature is None:
+            unreadable.add(idx)
+        else:
+            results.set(idx, signature)
+        if cache is not None:
+            entry = files[idx]
+            cache.put(entry.path, entry.size, entry.mtime_ns,
+                      '' if signature is None else format_signature(signature, algorithm))
+            if thumbnails:
+                cache.copy_thumbnails(files.paths[original], entry.path, entry.size, entry.mtime_ns)
+    report()
+    if hashes is not None:
+        hashes.update((files.paths[idx], format_signature(results.get(idx), algorithm)) for idx in results.rows())
+
+    # Зупинене сканування неповне: групи не будуються, а хеші лишаються в кеші для продовження
+    duplicates = []
+    if not stop_flag['stop']:
+        report_stage(progress_callback, 'group')
+        with metrics.timer('group'):
+            duplicates = results.groups(threshold, files.paths.__getitem__)
+
+    if duplicates and move_duplicates:
+        report_stage(progress_callback, 'move')
+        if cache is not None:
+            cache.checkpoint()
+        moved = move_groups(image_dir, duplicates, journal, cache, stop_flag, metrics)
+        snapshot.discard(moved)
+        if stats is not None:
+            stats['moved'] = len(moved)
+    if journal is not None:
+        journal.close()
+
+    if stats is not None:
+        stats['skipped_large'] = progress['skipped']
+        stats['resumed'] = resumed
+        if matcher is not None:
+            stats.update(matcher.stats)
+    if cache is not None:
+        with metrics.timer('cache'):
+            if not stop_flag['stop'] and not snapshot.partial:
+                cache.prune(files.paths)
+                cache.end_scan()
+            cache.close()
+        if stats is not None:
+            stats.update(cache.stats())
+    report_stage(progress_callback, 'done')
+
+    return duplicates
+
+def move_to_duplicates(image_dir, file, cache=None):
+    target = os.path.join(image_dir, DUPLICATE_DIR, file)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.move(os.path.join(image_dir, file), target)
+    logger.info("moved %s -> %s", file, os.path.join(DUPLICATE_DIR, file))
+    if cache is not None:
+        cache.move(file, os.path.join(DUPLICATE_DIR, file))
+    return target
+
+def move_groups(image_dir, duplicates, journal, cache=None, stop_flag=None, metrics=NULL_METRICS):
+    """Переміщення всіх файлів групи, крім першого, за планом у журналі; повертає множину переміщених"""
+    # Члени архівів лише потрапляють у звіт: переміщувати їх нікуди
+    planned = list(dict.fromkeys(file for group in duplicates for file in group[1:]
+                                 if split_member(file)[1] is None))
+    run = journal.plan(planned)
+    moved = set()
+    for file in planned:
+        if stop_flag and stop_flag['stop']:
+            break
+        with metrics.timer('move', file):
+            move_to_duplicates(image_dir, file, cache)
+        journal.done(run, file)
+        moved.add(file)
+    else:
+        journal.finish(run)
+    return moved
+
+def hash_shard(image_dir, output, shard, progress_callback, stop_flag, snapshot=None, stats=None,
+               algorithm=DEFAULT_ALGORITHM, **options):
+    """Map-крок розподіленого пошуку: хешування файлів одного шарду і запис переносного файлу хешів.
+    Повертає кількість записаних файлів або None, якщо перервано"""
+    index, count = shard
+    if not 0 <= index < count:
+        raise ValueError(f"Індекс шарду {index} поза межами 0..{count - 1}")
+    if snapshot is None:
+        snapshot = ImageSnapshot(image_dir, shard=shard)
+    hashes = {}
+    find_duplicates(image_dir, progress_callback, stop_flag, snapshot=snapshot, stats=stats, algorithm=algorithm,
+                    move_duplicates=False, hashes=hashes, **options)
+    if stop_flag['stop']:
+        return None
+    rows = [(entry.path, entry.size, entry.mtime_ns, hashes.get(entry.path, '')) for entry in snapshot.entries]
+    write_hash_index(output, rows, get_engine(algorithm).name, shard)
+    return len(rows)
+
+def write_hash_index(path, rows, algorithm, shard):
+    """Переносний файл хешів (JSON Lines, .gz — стиснений): заголовок, далі [шлях, розмір, mtime_ns, хеш];
+    шляхи записуються через '/', порожній хеш — файл не прочитано"""
+    opener = gzip.open if path.endswith('.gz') else open
+    tmp = path + '.tmp'
+    with opener(tmp, 'wt', encoding='utf-8', errors='surrogateescape') as f:
+        f.write(json.dumps({'format': HASH_INDEX_FORMAT, 'version': 1, 'algorithm': algorithm,
+                            'shard': list(shard), 'count': len(rows)}) + "\n")
+        for file, size, mtime_ns, h in rows:
+            f.write(json.dumps([file.replace(os.sep, '/'), size, mtime_ns, h], ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+def read_hash_index(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='surrogateescape') as f:
+        header = json.loads(f.readline() or 'null')
+        if not isinstance(header, dict) or header.get('format') != HASH_INDEX_FORMAT:
+            raise ValueError(f"Не файл хешів ImagePro: {path}")
+        rows = [json.loads(line) for line in f if line.strip()]
+    if len(rows) != header['count']:
+        raise ValueError(f"Файл хешів обрізаний: {path}")
+    return header, rows
+
+def merge_hash_indexes(paths, threshold=0, stats=None, partial=False):
+    """Reduce-крок: об'єднання файлів хешів усіх шардів в одне групування, таке саме, як при запуску на одному хості"""
+    algorithm = count = None
+    shards = set()
+    hashes = {}
+    for path in paths:
+        header, rows = read_hash_index(path)
+        if algorithm is None:
+            algorithm = header['algorithm']
+        elif header['algorithm'] != algorithm:
+            raise ValueError(f"Різні алгоритми хешування: {algorithm} і {header['algorithm']} ({path})")
+        index, shard_count = header['shard']
+        if count is None:
+            count = shard_count
+        elif shard_count != count:
+            raise ValueError(f"Різна кількість шардів: {count} і {shard_count} ({path})")
+        if index in shards:
+            raise ValueError(f"Шард {index} трапляється двічі ({path})")
+        shards.add(index)
+        hashes.update((file.replace('/', os.sep), h) for file, size, mtime_ns, h in rows)
+    missing = sorted(set(range(count or 0)) - shards)
+    if missing and not partial:
+        raise ValueError(f"Бракує шардів: {', '.join(map(str, missing))} з {count}")
+    groups = group_hashes([(file, parse_signature(h)) for file, h in hashes.items() if h], threshold)
+    if stats is not None:
+        stats.update({'algorithm': algorithm, 'shards': len(shards), 'shard_count': count,
+                      'files': len(hashes), 'missing_shards': missing})
+    return groups
+
+class MoveJournal:
+    """Журнал переміщень у Duplicate: план фіксується до першого переміщення, тож перерваний запуск можна завершити або скасувати"""
+    def __init__(self, image_dir, conn=None):
+        self.image_dir = image_dir
+        self.owned = conn is None
+        self.conn = connect_cache(image_dir) if conn is None else conn
+        self.conn.execute("CREATE TABLE IF NOT EXISTS moves (run TEXT, src TEXT, dst TEXT, done INTEGER, "
+                          "PRIMARY KEY (run, src))")
+
+    def plan(self, files):
+        """Записати весь план переміщень однією транзакцією; повертає ідентифікатор запуску"""
+        run = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.conn.executemany("INSERT OR REPLACE INTO moves VALUES (?, ?, ?, 0)",
+                              ((run, sql_path(file), sql_path(os.path.join(DUPLICATE_DIR, file))) for file in files))
+        self.conn.commit()
+        return run
+
+    def done(self, run, file):
+        self.conn.execute("UPDATE moves SET done = 1 WHERE run = ? AND src = ?", (run, sql_path(file)))
+
+    def finish(self, run=None):
+        self.conn.execute("DELETE FROM moves" + (" WHERE run = ?" if run else ""), (run,) if run else ())
+        self.conn.commit()
+
+    def pending(self):
+        """Незавершені запуски: {запуск: {'planned': заплановано, 'moved': уже в Duplicate}}"""
+        runs = {}
+        for run, src, dst in self.entries():
+            counts = runs.setdefault(run, {'planned': 0, 'moved': 0})
+            counts['planned'] += 1
+            if (os.path.lexists(os.path.join(self.image_dir, dst))
+                    and not os.path.lexists(os.path.join(self.image_dir, src))):
+                counts['moved'] += 1
+        return runs
+
+    def entries(self, run=None):
+        query = "SELECT run, src, dst FROM moves" + (" WHERE run = ?" if run else "") + " ORDER BY run, src"
+        return [(run_id, path_from_sql(src), path_from_sql(dst))
+                for run_id, src, dst in self.conn.execute(query, (run,) if run else ())]
+
+    def complete(self, cache=None, run=None):
+        """Довести перервані запуски до кінця; стан кожного файлу визначається за диском, а не за позначкою done"""
+        moved = []
+        for run_id, src, dst in self.entries(run):
+            source = os.path.join(self.image_dir, src)
+            target = os.path.join(self.image_dir, dst)
+            if os.path.lexists(source) and not os.path.lexists(target):
+                move_to_duplicates(self.image_dir, src, cache)
+                moved.append(src)
+            self.done(run_id, src)
+        self.finish(run)
+        return moved
+
+    def undo(self, cache=None, run=None):
+        """Повернути вже переміщені файли перерваних запусків на місце і забути ці запуски"""
+        restored = []
+        for run_id, src, dst in self.entries(run):
+            source = os.path.join(self.image_dir, src)
+            target = os.path.join(self.image_dir, dst)
+            if os.path.lexists(target) and not os.path.lexists(source):
+                os.makedirs(os.path.dirname(source), exist_ok=True)
+                shutil.move(target, source)
+                logger.info("restored %s -> %s", dst, src)
+                if cache is not None:
+                    cache.move(dst, src)
+                restored.append(src)
+        self.finish(run)
+        return restored
+
+    def close(self):
+        self.conn.commit()
+        if self.owned:
+            self.conn.close()
+
+class LiveIndex:
+    """Індекс хешів у пам'яті для режиму спостереження: додавання, видалення та пошук у межах порогу"""
+    def __init__(self, threshold=0, expected_size=0):
+        self.threshold = threshold
+        self.index = MultiIndexHash(threshold, expected_size=expected_size) if threshold > 0 else None
+        self.by_signature = defaultdict(set)
+        self.by_first = defaultdict(set)
+        self.files = {}
+
+    def add(self, path, size, mtime_ns, signature):
+        self.remove(path)
+        first = signature[0] if isinstance(signature, tuple) else signature
+        if self.index is not None and first not in self.by_first:
+            self.index.add(first)
+        self.by_first[first].add(signature)
+        self.by_signature[signature].add(path)
+        self.files[path] = (size, mtime_ns, signature)
+
+    def remove(self, path):
+        entry = self.files.pop(path, None)
+        if entry is not None:
+            paths = self.by_signature[entry[2]]
+            paths.discard(path)
+            if not paths:
+                del self.by_signature[entry[2]]
+
+    def unchanged(self, path, size, mtime_ns):
+        entry = self.files.get(path)
+        return entry is not None and entry[0] == size and entry[1] == mtime_ns
+
+    def match(self, signature):
+        """Наявний файл з тим самим або близьким підписом (найменший шлях для детермінованості)"""
+        if signature in self.by_signature:
+            return min(self.by_signature[signature])
+        if self.index is None:
+            return None
+        first = signature[0] if isinstance(signature, tuple) else signature
+        found = []
+        for other_first in self.index.search(first):
+            for other in self.by_first[other_first]:
+                if other not in self.by_signature:
+                    continue
+                if isinstance(signature, tuple) and any((a ^ b).bit_count() > self.threshold
+                                                        for a, b in zip(signature[1:], other[1:])):
+                    continue
+                found.extend(self.by_signature[other])
+        return min(found) if found else None
+
+class InotifyWatcher:
+    """Події inotify (Linux, ctypes): пари (відносний шлях, 'writing' | 'changed' | 'deleted' | 'rescan')"""
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+
+    def __init__(self, folder, recursive=False, include=None, exclude=None):
+        import ctypes
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.folder = folder
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.dirs = {}
+        self.watch('', folder)
+
+    def watch(self, rel_dir, path):
+        """Підписка на папку (і підпапки в рекурсивному режимі); повертає вже наявні в ній зображення"""
+        import ctypes
+        mask = (self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO
+                | self.IN_CREATE | self.IN_DELETE)
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch: {path}")
+        self.dirs[wd] = rel_dir
+        found = []
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            entries = []
+        for entry in entries:
+            rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive and not (not rel_dir and entry.name in SKIP_DIRS):
+                        found.extend(self.watch(rel, entry.path))
+                elif rel_dir and is_image_path(rel, self.include, self.exclude):
+                    found.append(rel)
+            except OSError:
+                continue
+        return found
+
+    def read(self, timeout):
+        import select
+        import struct
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+            name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b'\0'))
+            offset += 16 + length
+            if mask & self.IN_Q_OVERFLOW:
+                events.append(('', 'rescan'))
+                continue
+            rel_dir = self.dirs.get(wd)
+            if rel_dir is None or not name:
+                continue
+            rel = os.path.join(rel_dir, name) if rel_dir else name
+            if mask & self.IN_ISDIR:
+                if self.recursive and mask & (self.IN_CREATE | self.IN_MOVED_TO) and not (
+                        not rel_dir and name in SKIP_DIRS):
+                    try:
+                        events.extend((found, 'changed') for found in self.watch(rel, os.path.join(self.folder, rel)))
+                    except OSError:
+                        pass
+                continue
+            if not is_image_path(rel, self.include, self.exclude):
+                continue
+            if mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                events.append((rel, 'deleted'))
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                events.append((rel, 'changed'))
+            else:
+                events.append((rel, 'writing'))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Резервне спостереження: періодичне сканування з порівнянням розміру та mtime"""
+    def __init__(self, folder, interval=WATCH_POLL_INTERVAL, **scan_options):
+        self.folder = folder
+        self.interval = interval
+        self.scan_options = scan_options
+        self.state = self.scan()
+        self.next_poll = time.monotonic() + interval
+
+    def scan(self):
+        return {entry.path: (entry.size, entry.mtime_ns) for entry in scan_images(self.folder, **self.scan_options)}
+
+    def read(self, timeout):
+        wait = self.next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, wait))
+        self.next_poll = time.monotonic() + self.interval
+        state = self.scan()
+        events = [(path, 'changed') for path, stamp in state.items() if self.state.get(path) != stamp]
+        events += [(path, 'deleted') for path in self.state if path not in state]
+        self.state = state
+        return events
+
+    def close(self):
+        pass
+
+def open_watcher(folder, poll=False, recursive=False, include=None, exclude=None, symlinks='files'):
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(folder, recursive=recursive, include=include, exclude=exclude)
+        except (OSError, AttributeError) as e:
+            logger.warning("inotify недоступний (%s), використовується опитування", e)
+    return PollingWatcher(folder, recursive=recursive, include=include, exclude=exclude, symlinks=symlinks)
+
+def watch_folder(image_dir, stop_flag, decision_callback=None, progress_callback=None, threshold=0,
+                 algorithm=DEFAULT_ALGORITHM, workers=1, fast_decode=True, max_pixels=MAX_HASH_PIXELS,
+                 poll=False, recursive=False, include=None, exclude=None, symlinks='files'):
+    """Початкове сканування, а далі перевірка кожного нового чи зміненого файлу щодо живого індексу хешів"""
+    algorithm = get_engine(algorithm).name
+    scan_options = {'recursive': recursive, 'include': include, 'exclude': exclude, 'symlinks': symlinks}
+    watcher = open_watcher(image_dir, poll=poll, **scan_options)
+    try:
+        snapshot = ImageSnapshot(image_dir, **scan_options)
+        find_duplicates(image_dir, progress_callback or (lambda *args: None), stop_flag, threshold=threshold,
+                        workers=workers, fast_decode=fast_decode, max_pixels=max_pixels, snapshot=snapshot,
+                        algorithm=algorithm)
+        cache = HashCache(image_dir, algorithm=algorithm, fast_decode=fast_decode, max_pixels=max_pixels)
+        index = LiveIndex(threshold, expected_size=len(snapshot.entries))
+        for entry in snapshot.entries:
+            h = cache.get(entry.path, entry.size, entry.mtime_ns)
+            if h:
+                index.add(entry.path, entry.size, entry.mtime_ns, parse_signature(h))
+        logger.info("watch %s: %d files indexed via %s", image_dir, len(index.files), type(watcher).__name__)
+
+        hash_options = {'algorithm': algorithm, 'fast_decode': fast_decode, 'max_pixels': max_pixels}
+        pending = {}
+        polling = isinstance(watcher, PollingWatcher)
+        recheck = max(WATCH_SETTLE, watcher.interval) if polling else WATCH_SETTLE
+        counts = {'checked': 0, 'moved': 0}
+        dirty = False
+        while not stop_flag['stop']:
+            now = time.monotonic()
+            timeout = min([deadline for deadline, _, _ in pending.values()] + [now + WATCH_POLL_INTERVAL]) - now
+            for rel, event in watcher.read(max(0.0, timeout)):
+                if event == 'rescan':
+                    for entry in scan_images(image_dir, **scan_options):
+                        if not index.unchanged(entry.path, entry.size, entry.mtime_ns):
+                            pending.setdefault(entry.path, [0.0, time.monotonic(), None])
+                elif event == 'deleted':
+                    pending.pop(rel, None)
+                    index.remove(rel)
+                elif event == 'writing':
+                    # файл ще відкритий на запис: чекаємо на закриття, але не довше WATCH_WRITE_TIMEOUT
+                    arrived = pending[rel][1] if rel in pending else time.monotonic()
+                    pending[rel] = [time.monotonic() + WATCH_WRITE_TIMEOUT, arrived, None]
+                else:
+                    pending[rel] = [time.monotonic() + WATCH_SETTLE, time.monotonic(), None]
+
+            now = time.monotonic()
+            for rel, (deadline, arrived, last_stamp) in list(pending.items()):
+                if deadline > now:
+                    continue
+                try:
+                    st = os.stat(os.path.join(image_dir, rel))
+                except OSError:
+                    del pending[rel]
+                    continue
+                stamp = (st.st_size, st.st_mtime_ns)
+                if polling:
+                    # опитування не бачить закриття файлу, а повільне копіювання може не оновлювати mtime:
+                    # розмір і mtime мають збігтися у двох перевірках поспіль
+                    settled = st.st_size > 0 and stamp == last_stamp
+                else:
+                    settled = stamp == last_stamp or (
+                        st.st_size > 0 and time.time_ns() - st.st_mtime_ns >= WATCH_SETTLE * 1e9)
+                if not settled:
+                    pending[rel] = [now + recheck, arrived, stamp]
+                    continue
+                del pending[rel]
+                if index.unchanged(rel, *stamp):
+                    continue
+                h = hash_file(os.path.join(image_dir, rel), **hash_options).hash
+                counts['checked'] += 1
+                dirty = True
+                decision = {'file': rel, 'duplicate_of': None, 'moved_to': None}
+                if not h:
+                    decision['skipped'] = 'too_large' if h is None else 'unreadable'
+                else:
+                    signature = parse_signature(h)
+                    index.remove(rel)
+                    original = index.match(signature)
+                    if original is not None and original != rel:
+                        cache.put(rel, st.st_size, st.st_mtime_ns, h)
+                        move_to_duplicates(image_dir, rel, cache)
+                        decision['duplicate_of'] = original
+                        decision['moved_to'] = os.path.join(DUPLICATE_DIR, rel)
+                        counts['moved'] += 1
+                    else:
+                        cache.put(rel, st.st_size, st.st_mtime_ns, h)
+                        index.add(rel, st.st_size, st.st_mtime_ns, signature)
+                decision['latency'] = time.monotonic() - arrived
+                logger.debug("watch %s", decision)
+                if decision_callback:
+                    decision_callback(decision)
+            if dirty:
+                cache.flush()
+                dirty = False
+        cache.close()
+        counts['indexed'] = len(index.files)
+        return counts
+    finally:
+        watcher.close()
+
+def popcount64(values):
+    import numpy as np
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return np.unpackbits(np.ascontiguousarray(values).view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+def rotate_left(values, shift):
+    import numpy as np
+    values = np.asarray(values, dtype=np.uint64)
+    if shift == 0:
+        return values
+    return (values << np.uint64(shift)) | (values >> np.uint64(64 - shift))
+
+def merge_sorted(old, old_ids, new, new_ids, out_path, ids_path, chunk=REFERENCE_CHUNK, id_offset=0):
+    """Злиття двох відсортованих масивів (на диску або в пам'яті) за один прохід частинами по chunk.
+    До ідентифікаторів другого масиву додається id_offset"""
+    import numpy as np
+    total = len(old) + len(new)
+    out = np.lib.format.open_memmap(out_path, mode='w+', dtype=np.uint64, shape=(total,))
+    out_ids = np.lib.format.open_memmap(ids_path, mode='w+', dtype=np.uint32, shape=(total,))
+    i = j = written = 0
+    while written < total:
+        left, right = old[i:i + chunk], new[j:j + chunk]
+        take_left, take_right = len(left), len(right)
+        full = [int(part[-1]) for part in (left, right) if len(part) == chunk]
+        if full:
+            # далі в масивах лише значення, не менші за останні елементи повних частин
+            bound = min(full)
+            take_left = int(np.searchsorted(left, bound, side='right'))
+            take_right = int(np.searchsorted(right, bound, side='right'))
+        values = np.concatenate([left[:take_left], right[:take_right]])
+        ids = np.concatenate([old_ids[i:i + take_left],
+                              np.asarray(new_ids[j:j + take_right], dtype=np.uint32) + np.uint32(id_offset)])
+        order = np.argsort(values, kind='stable')
+        end = written + len(values)
+        out[written:end] = values[order]
+        out_ids[written:end] = ids[order]
+        i, j, written = i + take_left, j + take_right, end
+    out.flush()
+    out_ids.flush()
+    del out, out_ids
+
+class ReferenceIndex:
+    """Постійний індекс еталонної бібліотеки: відсортовані масиви uint64 через mmap і таблиця шляхів.
+
+    Для кожного з blocks блоків хеша зберігається копія, циклічно зсунута так, що блок стоїть
+    у старших бітах; хеш у межах відстані r збігається з запитом принаймні в одному блоці
+    з не більш ніж r // blocks відмінними бітами, тож пошук — це кілька двійкових пошуків.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.load()
+
+    def load(self):
+        import numpy as np
+        path = self.path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.count = self.meta['count']
+        self.blocks = self.meta['blocks']
+        self.width = 64 // self.blocks
+        if self.count:
+            self.arrays = [np.load(os.path.join(path, f'block{b}.npy'), mmap_mode='r') for b in range(self.blocks)]
+            self.ids = [np.load(os.path.join(path, f'block{b}_ids.npy'), mmap_mode='r') for b in range(self.blocks)]
+            self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        else:
+            self.arrays = self.ids = []
+            self.offsets = None
+
+    @classmethod
+    def create(cls, path, algorithm=DEFAULT_ALGORITHM, blocks=REFERENCE_BLOCKS):
+        if '+' in algorithm or algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Індекс підтримує один 64-бітний алгоритм, а не {algorithm}")
+        if 64 % blocks:
+            raise ValueError("Кількість блоків має ділити 64")
+        os.makedirs(path, exist_ok=True)
+        open(os.path.join(path, 'paths.bin'), 'wb').close()
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'algorithm': algorithm, 'blocks': blocks, 'count': 0}, f)
+        return cls(path)
+
+    @classmethod
+    def open_or_create(cls, path, algorithm=DEFAULT_ALGORITHM, blocks=REFERENCE_BLOCKS):
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            index = cls(path)
+            if index.meta['algorithm'] != algorithm:
+                raise ValueError(f"Індекс побудовано алгоритмом {index.meta['algorithm']}, а не {algorithm}")
+            return index
+        return cls.create(path, algorithm, blocks)
+
+    def append(self, entries):
+        """Додавання пар (шлях, хеш-int); нові ідентифікатори продовжують нумерацію"""
+        import numpy as np
+        entries = list(entries)
+        if not entries:
+            return 0
+        if self.count + len(entries) >= 1 << 32:
+            raise ValueError("Індекс вміщує не більше 2^32 хешів")
+        encoded = [path.encode('utf-8', 'surrogateescape') for path, _ in entries]
+        with open(os.path.join(self.path, 'paths.bin'), 'r+b') as f:
+            f.seek(0 if self.offsets is None else int(self.offsets[-1]))
+            for data in encoded:
+                f.write(data)
+            f.truncate()
+        lengths = np.cumsum([len(data) for data in encoded], dtype=np.uint64)
+        if self.offsets is None:
+            offsets = np.concatenate([np.zeros(1, dtype=np.uint64), lengths])
+        else:
+            offsets = np.concatenate([self.offsets, self.offsets[-1] + lengths])
+        new_ids = np.arange(self.count, self.count + len(entries), dtype=np.uint32)
+        values = np.array([h for _, h in entries], dtype=np.uint64)
+        empty = np.zeros(0, dtype=np.uint64)
+        for b in range(self.blocks):
+            rotated = rotate_left(values, b * self.width)
+            order = np.argsort(rotated, kind='stable')
+            merge_sorted(self.arrays[b] if self.count else empty,
+                         self.ids[b] if self.count else new_ids[:0],
+                         rotated[order], new_ids[order], *self.block_files(b, '.tmp'))
+        self.commit(offsets, self.count + len(entries))
+        return len(entries)
+
+    def block_files(self, b, suffix=''):
+        return (os.path.join(self.path, f'block{b}{suffix}.npy'), os.path.join(self.path, f'block{b}_ids{suffix}.npy'))
+
+    def commit(self, offsets, count):
+        """Атомарна заміна масивів блоків (уже записаних у .tmp), зміщень і meta.json"""
+        import numpy as np
+        self.arrays = self.ids = []
+        self.offsets = None
+        for b in range(self.blocks):
+            for tmp, final in zip(self.block_files(b, '.tmp'), self.block_files(b)):
+                os.replace(tmp, final)
+        np.save(os.path.join(self.path, 'offsets.tmp.npy'), offsets)
+        os.replace(os.path.join(self.path, 'offsets.tmp.npy'), os.path.join(self.path, 'offsets.npy'))
+        self.meta['count'] = count
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))
+        self.load()
+
+    def merge(self, other, chunk=REFERENCE_CHUNK):
+        """Додавання всіх записів іншого індексу того ж алгоритму: paths.bin дописується як є,
+        а кожен масив блоку переписується один раз злиттям двох відсортованих mmap частинами по chunk"""
+        import numpy as np
+        if other.meta['algorithm'] != self.meta['algorithm']:
+            raise ValueError("Індекси побудовано різними алгоритмами")
+        if not other.count:
+            return 0
+        if self.count + other.count >= 1 << 32:
+            raise ValueError("Індекс вміщує не більше 2^32 хешів")
+        base = 0 if self.offsets is None else int(self.offsets[-1])
+        with open(os.path.join(self.path, 'paths.bin'), 'r+b') as f, \
+                open(os.path.join(other.path, 'paths.bin'), 'rb') as src:
+            f.seek(base)
+            shutil.copyfileobj(src, f, DIGEST_BLOCK_SIZE)
+            f.truncate()
+        offsets = np.concatenate([np.zeros(1, dtype=np.uint64) if self.offsets is None else self.offsets,
+                                  np.asarray(other.offsets[1:], dtype=np.uint64) + np.uint64(base)])
+        if other.blocks != self.blocks:
+            # інше розбиття на блоки: зсунуті копії будуються заново з блоку 0 (незсунуті хеші)
+            values = np.empty(other.count, dtype=np.uint64)
+            values[other.ids[0]] = other.arrays[0]
+        empty = np.zeros(0, dtype=np.uint64)
+        for b in range(self.blocks):
+            if other.blocks == self.blocks:
+                sorted_values, sorted_ids = other.arrays[b], other.ids[b]
+            else:
+                rotated = rotate_left(values, b * self.width)
+                sorted_ids = np.argsort(rotated, kind='stable').astype(np.uint32)
+                sorted_values = rotated[sorted_ids]
+            merge_sorted(self.arrays[b] if self.count else empty,
+                         self.ids[b] if self.count else empty.astype(np.uint32),
+                         sorted_values, sorted_ids, *self.block_files(b, '.tmp'), chunk=chunk, id_offset=self.count)
+        self.commit(offsets, self.count + other.count)
+        return other.count
+
+    def resolve(self, id):
+        with open(os.path.join(self.path, 'paths.bin'), 'rb') as f:
+            f.seek(int(self.offsets[id]))
+            return f.read(int(self.offsets[id + 1] - self.offsets[id])).decode('utf-8', 'surrogateescape')
+
+    def check_radius(self, radius):
+        """Кількість проб — C(ширина блоку, radius // blocks); понад REFERENCE_MAX_FLIPS бітів їх забагато"""
+        if radius // self.blocks > REFERENCE_MAX_FLIPS:
+            suited = [b for b in (1, 2, 4, 8) if radius // b <= REFERENCE_MAX_FLIPS]
+            hint = f"; створіть індекс з --blocks {suited[0]}" if suited else ""
+            raise ValueError(f"Радіус {radius} завеликий для індексу з {self.blocks} блоками: "
+                             f"найбільший {self.blocks * (REFERENCE_MAX_FLIPS + 1) - 1}{hint}")
+
+    def query(self, values, radius=0):
+        """Для кожного запиту — список пар (id, відстань) еталонів у межах radius"""
+        import numpy as np
+        self.check_radius(radius)
+        values = np.asarray(values, dtype=np.uint64)
+        results = [dict() for _ in values]
+        if not self.count or not len(values):
+            return [[] for _ in values]
+        low_bits = 64 - self.width
+        blocks = range(self.blocks) if radius else range(1)
+        masks = MultiIndexHash.flip_masks(self.width, radius // self.blocks)
+        for b in blocks:
+            rotated = rotate_left(values, b * self.width)
+            prefixes = rotated >> np.uint64(low_bits)
+            for mask in masks:
+                probe = (prefixes ^ np.uint64(mask)) << np.uint64(low_bits)
+                lo = np.searchsorted(self.arrays[b], probe, side='left')
+                hi = np.searchsorted(self.arrays[b], probe | np.uint64((1 << low_bits) - 1), side='right')
+                for q in np.nonzero(hi > lo)[0]:
+                    distances = popcount64(self.arrays[b][lo[q]:hi[q]] ^ rotated[q])
+                    keep = distances <= radius
+                    for id, distance in zip(self.ids[b][lo[q]:hi[q]][keep], distances[keep]):
+                        results[q][int(id)] = int(distance)
+        return [sorted(found.items(), key=lambda item: (item[1], item[0])) for found in results]
+
+def reflink(src, dst):
+    """Копіювання з спільними блоками (copy-on-write), якщо файлова система це підтримує"""
+    if sys.platform.startswith('linux'):
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                fdst.close()
+                os.remove(dst)
+                raise
+    elif sys.platform == 'darwin':
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            raise OSError(ctypes.get_errno(), "clonefile failed", src)
+    else:
+        raise OSError(errno.ENOTSUP, "reflink is not supported", src)
+    shutil.copystat(src, dst)
+
+def materialize(src, dst, mode):
+    """Розміщення файлу у підпапці розподілу; повертає фактично використаний режим"""
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        if mode == 'hardlink':
+            os.link(src, dst)
+        elif mode == 'reflink':
+            reflink(src, dst)
+        elif mode == 'symlink':
+            os.symlink(os.path.abspath(src), dst)
+        elif mode == 'move':
+            shutil.move(src, dst)
+        else:
+            shutil.copy2(src, dst)
+        return mode
+    except OSError:
+        if mode == 'copy':
+            raise
+        shutil.copy2(src, dst)
+        return 'copy'
+
+def run_bounded(func, items, workers, stop_flag=None):
+    """Виконання func для кожного елемента у пулі потоків з обмеженою кількістю задач у черзі"""
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        while True:
+            while len(pending) < workers * 4:
+                item = next(items, None)
+                if item is None or (stop_flag and stop_flag['stop']):
+                    break
+                pending.add(pool.submit(func, item))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def split_bucket(path, seed):
+    key = f"{seed}:{path.replace(os.sep, '/')}".encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+
+def assign_split(bucket, train_pct, val_pct):
+    position = bucket / (1 << 64) * 100
+    if position < train_pct:
+        return 'train'
+    if position < train_pct + val_pct:
+        return 'val'
+    return 'test'
+
+def cluster_files(folder, entries, threshold=0, algorithm=DEFAULT_ALGORITHM, hash_files=None):
+    """Кластери схожих файлів за хешами попереднього сканування (кеш папки або файли хешів) без декодування.
+    Хеш береться лише для незміненого файлу (той самий розмір і mtime); повертає (кластери, кількість без хешу)"""
+    known = {}
+    lookup = known.get
+    if hash_files:
+        for path in hash_files:
+            header, rows = read_hash_index(path)
+            if header['algorithm'] != algorithm:
+                raise ValueError(f"Файл хешів {path} створено алгоритмом {header['algorithm']}, а не {algorithm}")
+            known.update((file.replace('/', os.sep), (size, mtime_ns, h)) for file, size, mtime_ns, h in rows)
+    elif os.path.exists(os.path.join(folder, CACHE_FILE)):
+        cache = HashCache(folder, algorithm=algorithm)
+        cache.close()
+        lookup = cache.record
+    hashed = []
+    missing = 0
+    for entry in entries:
+        record = lookup(entry.path)
+        if record is None or record[0] != entry.size or record[1] != entry.mtime_ns:
+            missing += 1
+        elif record[2]:
+            hashed.append((entry.path, parse_signature(record[2])))
+    clusters = group_hashes(hashed, threshold)
+    grouped = {file for cluster in clusters for file in cluster}
+    clusters.extend([entry.path] for entry in entries if entry.path not in grouped)
+    return clusters, missing
+
+def assign_clusters(clusters, train_pct, val_pct, test_pct, seed='', tolerance=SPLIT_TOLERANCE, pinned=None):
+    """Розподіл цілих кластерів: кластер іде в підмножину за хешем свого першого файлу, якщо вона ще не
+    досягла цілі й не переповнюється понад допуск (у відсоткових пунктах), інакше — туди, де до цілі
+    бракує найбільше, тож за невеликих кластерів жодна підмножина не лишається недобраною.
+    Великі кластери розміщуються першими. Кластер з уже розподіленими файлами (pinned) лишається в їхній
+    підмножині; повертає нові файли кожної підмножини та кількість усіх файлів у ній"""
+    pinned = pinned or {}
+    total = sum(len(cluster) for cluster in clusters)
+    targets = {'train': total * train_pct / 100, 'val': total * val_pct / 100, 'test': total * test_pct / 100}
+    slack = total * tolerance / 100
+    counts = dict.fromkeys(SPLITS, 0)
+    assigned = {name: [] for name in SPLITS}
+    free = []
+    for cluster in clusters:
+        fixed = [pinned[f] for f in cluster if f in pinned]
+        if not fixed:
+            free.append(sorted(cluster))
+            continue
+        split = max(SPLITS, key=fixed.count)
+        counts[split] += len(cluster)
+        assigned[split].extend(f for f in cluster if f not in pinned)
+    free.sort(key=lambda cluster: (-len(cluster), split_bucket(cluster[0], seed)))
+    for cluster in free:
+        split = assign_split(split_bucket(cluster[0], seed), train_pct, val_pct)
+        if counts[split] >= targets[split] or counts[split] + len(cluster) > targets[split] + slack:
+            split = max(SPLITS, key=lambda name: targets[name] - counts[name])
+        counts[split] += len(cluster)
+        assigned[split].extend(cluster)
+    return assigned, counts
+
+def read_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as f:
+        if path.lower().endswith('.csv'):
+            return {row['file']: row['split'] for row in csv.DictReader(f)}
+        return {row['file']: row['split'] for row in map(json.loads, filter(str.strip, f))}
+
+def write_manifest(path, rows, append=False):
+    is_csv = path.lower().endswith('.csv')
+    write_header = is_csv and not (append and os.path.exists(path))
+    with open(path, 'a' if append else 'w', encoding='utf-8', errors='surrogateescape', newline='') as f:
+        if is_csv:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(['file', 'split', 'hash'])
+            writer.writerows(rows)
+        else:
+            for file, split, h in rows:
+                f.write(json.dumps({'file': file, 'split': split, 'hash': h}, ensure_ascii=False) + "\n")
+
+def parse_size(text):
+    """Розмір у байтах з суфіксом K, M або G (двійкові одиниці), напр. '512M'"""
+    text = str(text).strip().upper().rstrip('B')
+    factor = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}.get(text[-1:], 1)
+    value = int(float(text[:-1] if factor > 1 else text) * factor)
+    if value <= 0:
+        raise ValueError(f"Розмір має бути додатним: {text}")
+    return value
+
+def plan_shards(items, size_of, shard_size):
+    """Послідовне пакування у шарди: новий шард починається, коли наступний файл уже не влазить
+    (з урахуванням кінцевих блоків tar і вирівнювання до запису)"""
+    limit = shard_size // tarfile.RECORDSIZE * tarfile.RECORDSIZE - 2 * tarfile.BLOCKSIZE
+    shards = []
+    used = limit
+    for item in items:
+        cost = tarfile.BLOCKSIZE + -(-size_of(item) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        if used + cost > limit:
+            shards.append([])
+            used = 0
+        shards[-1].append(item)
+        used += cost
+    return shards
+
+def write_shard(path, samples, folder, metrics=NULL_METRICS):
+    """Запис tar-шарда у стилі WebDataset з потокового читання джерел; повертає рядки індексу
+    (файл, ключ, зміщення даних у шарді, розмір)"""
+    rows = []
+    reader = ArchiveReader()
+    tmp = path + '.tmp'
+    try:
+        with tarfile.open(tmp, 'w') as tar:
+            for key, f, mtime_ns in samples:
+                archive, member = split_member(f)
+                info = tarfile.TarInfo(f"{key}.{f.rsplit('.', 1)[-1].lower()}")
+                info.mtime = mtime_ns // 1_000_000_000
+                if member is None:
+                    with metrics.timer('place', f), open(os.path.join(folder, f), 'rb') as src:
+                        info.size = os.fstat(src.fileno()).st_size
+                        tar.addfile(info, src)
+                else:
+                    with metrics.timer('read', f):
+                        data = reader.read(os.path.join(folder, archive), member)
+                    with metrics.timer('place', f):
+                        info.size = len(data)
+                        tar.addfile(info, io.BytesIO(data))
+                padded = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                rows.append((f, key, tar.offset - padded, info.size))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        reader.close()
+    return rows
+
+def split_dataset(folder, train_pct, val_pct, test_pct, log_callback, snapshot=None, mode='copy',
+                  io_workers=IO_WORKERS, stats=None, seed=None, manifest=None, write_files=True,
+                  incremental=False, progress_callback=None, stop_flag=None, metrics=None, shard_size=SHARD_SIZE,
+                  group_threshold=None, algorithm=DEFAULT_ALGORITHM, hash_files=None, tolerance=SPLIT_TOLERANCE):
+    if mode not in SPLIT_MODES:
+        raise ValueError(f"Невідомий режим розподілу: {mode}")
+    if incremental and not manifest:
+        raise ValueError("Інкрементальний розподіл потребує файлу маніфесту")
+    if snapshot is None:
+        snapshot = ImageSnapshot(folder)
+    metrics = metrics or NULL_METRICS
+    existing = read_manifest(manifest) if incremental else {}
+    files = [entry.path for entry in metrics.iterate(snapshot, 'list', lambda entry: entry.path)
+             if entry.path not in existing]
+    bucket_seed = '' if seed is None else seed
+    assigned = {name: [] for name in SPLITS}
+
+    if group_threshold is not None:
+        with metrics.timer('group'):
+            clusters, missing = cluster_files(folder, snapshot.entries, group_threshold,
+                                              get_engine(algorithm).name, hash_files)
+            assigned, counts = assign_clusters(clusters, train_pct, val_pct, test_pct, bucket_seed,
+                                               tolerance, existing)
+        if missing:
+            log_callback(f"⚠ {missing} файлів без актуального хешу з попереднього сканування — "
+                         "вони розподілені поодинці")
+        grouped = [cluster for cluster in clusters if len(cluster) > 1]
+        total_count = sum(counts.values()) or 1
+        deviation = max(abs(counts[name] / total_count * 100 - pct)
+                        for name, pct in zip(SPLITS, (train_pct, val_pct, test_pct)))
+        log_callback(f"🧩 {len(grouped)} кластерів схожих зображень ({sum(map(len, grouped))} файлів) "
+                     f"лишаються цілими; відхилення від відсотків {deviation:.2f} п.п.")
+        if deviation > tolerance:
+            reason = "завеликі кластери" + (" або файли, розподілені раніше" if existing else "")
+            log_callback(f"⚠ Відхилення перевищує допуск {tolerance} п.п.: {reason}")
+        if stats is not None:
+            stats.update({'clusters': len(grouped), 'unhashed': missing, 'deviation': round(deviation, 4)})
+    elif seed is None and not incremental:
+        random.shuffle(files)
+        train_count = int(len(files) * train_pct / 100)
+        val_count = int(len(files) * val_pct / 100)
+        assigned['train'] = files[:train_count]
+        assigned['val'] = files[train_count:train_count+val_count]
+        assigned['test'] = files[train_count+val_count:]
+    else:
+        for f in sorted(files):
+            assigned[assign_split(split_bucket(f, bucket_seed), train_pct, val_pct)].append(f)
+
+    order = {entry.path: idx for idx, entry in enumerate(snapshot.entries)}
+    entries = {entry.path: entry for entry in snapshot.entries}
+    reader = ArchiveReader()
+    used_modes = defaultdict(int)
+    total = sum(len(subfiles) for subfiles in assigned.values())
+    done = 0
+    placed = {name: [] for name in SPLITS}
+    report_stage(progress_callback, 'place')
+
+    for subfolder, subfiles in assigned.items():
+        if stop_flag and stop_flag['stop']:
+            break
+        if write_files and mode == 'shards':
+            img_path = os.path.join(folder, 'images', subfolder)
+            os.makedirs(img_path, exist_ok=True)
+            index_path = os.path.join(img_path, SHARD_INDEX)
+            old_shards = sorted(name for name in os.listdir(img_path) if fnmatch(name, f"{subfolder}-[0-9]*.tar"))
+            if incremental:
+                first_shard = len(old_shards)
+                first_key = 0
+                if os.path.exists(index_path):
+                    with open(index_path, 'r', encoding='utf-8') as f:
+                        first_key = sum(1 for line in f if line.strip())
+            else:
+                for name in old_shards:
+                    os.remove(os.path.join(img_path, name))
+                first_shard = first_key = 0
+            # порядок сканування: члени архівів у кожному шарді читаються лише вперед
+            samples = [(f"{first_key + n:09d}", f, entries[f].mtime_ns)
+                       for n, f in enumerate(sorted(subfiles, key=order.get))]
+            shards = plan_shards(samples, lambda sample: entries[sample[1]].size, shard_size)
+
+            def pack(item):
+                number, shard = item
+                name = f"{subfolder}-{first_shard + number:06d}.tar"
+                return name, write_shard(os.path.join(img_path, name), shard, folder, metrics)
+
+            written = []
+            for name, rows in run_bounded(pack, enumerate(shards), io_workers, stop_flag):
+                written.append((name, rows))
+                used_modes['shards'] += len(rows)
+                placed[subfolder].extend(row[0] for row in rows)
+                done += len(rows)
+                logger.debug("%s shard %s: %d files", subfolder, name, len(rows))
+                if progress_callback:
+                    progress_callback(f"Розміщено {done}/{total} файлів", done, total)
+            with open(index_path, 'a' if incremental else 'w', encoding='utf-8') as out:
+                for name, rows in sorted(written):
+                    for f, key, offset, size in rows:
+                        out.write(json.dumps({'file': f, 'key': key, 'shard': name, 'offset': offset, 'size': size},
+                                             ensure_ascii=False) + "\n")
+            log_callback(f"📦 {subfolder.upper()}: {len(written)} шардів, індекс {index_path}")
+        elif write_files:
+            img_path = os.path.join(folder, 'images', subfolder)
+            os.makedirs(img_path, exist_ok=True)
+            for subdir in {os.path.dirname(local_path(f)) for f in subfiles} - {''}:
+                os.makedirs(os.path.join(img_path, subdir), exist_ok=True)
+
+            def sources():
+                # Члени архівів читаються послідовно в порядку сканування, запис іде паралельно в пулі
+                for f in sorted(subfiles, key=order.get):
+                    archive, member = split_member(f)
+                    if member is None:
+                        yield f, None
+                    else:
+                        with metrics.timer('read', f):
+                            data = reader.read(os.path.join(folder, archive), member)
+                        yield f, data
+
+            def place(item):
+                f, data = item
+                target = os.path.join(img_path, local_path(f))
+                with metrics.timer('place', f):
+                    if data is None:
+                        return f, materialize(os.path.join(folder, f), target, mode)
+                    with open(target, 'wb') as out:
+                        out.write(data)
+                    return f, 'extract'
+
+            for f, used in run_bounded(place, sources(), io_workers, stop_flag):
+                used_modes[used] += 1
+                logger.debug("%s %s %s", subfolder, used, f)
+                placed[subfolder].append(f)
+                done += 1
+                if progress_callback:
+                    progress_callback(f"Розміщено {done}/{total} файлів", done, total)
+        else:
+            placed[subfolder] = subfiles
+            done += len(subfiles)
+            if progress_callback:
+                progress_callback(f"Розподілено {done}/{total} файлів", done, total)
+
+    reader.close()
+    if stop_flag and stop_flag['stop']:
+        log_callback(f"⏹ Розподіл зупинено: розміщено {done}/{total} файлів")
+    assigned = placed
+    totals = {name: len(subfiles) for name, subfiles in assigned.items()}
+    for split in existing.values():
+        totals[split] = totals.get(split, 0) + 1
+    for subfolder, subfiles in assigned.items():
+        if existing:
+            log_callback(f"✓ {subfolder.upper()}: +{len(subfiles)} нових, всього {totals[subfolder]} файлів")
+        else:
+            log_callback(f"✓ {subfolder.upper()}: {len(subfiles)} файлів")
+
+    if manifest:
+        report_stage(progress_callback, 'manifest')
+        rows = [(f, subfolder, f"{split_bucket(f, bucket_seed):016x}")
+                for subfolder, subfiles in assigned.items() for f in subfiles]
+        with metrics.timer('manifest'):
+            write_manifest(manifest, rows, append=bool(existing))
+        log_callback(f"📝 Маніфест: {manifest}")
+
+    if used_modes.get('copy') and mode != 'copy':
+        log_callback(f"⚠ {used_modes['copy']} файлів скопійовано: режим '{mode}' недоступний для них")
+    if stats is not None:
+        stats['modes'] = dict(used_modes)
+        stats['new'] = done
+        stats['splits'] = totals
+
+    if write_files and not existing and mode != 'shards':
+        counts = {}
+        for subfolder in SPLITS:
+            img_path = os.path.join(folder, 'images', subfolder)
+            count = sum(1 for _ in scan_images(img_path, recursive=True))
+            counts[subfolder] = count
+    else:
+        counts = totals
+
+    with open("split_log.txt", "w", encoding='utf-8') as f:
+        f.write(f"Dataset Split Results:\n")
+        f.write(f"Train: {len(assigned['train'])} files\n")
+        f.write(f"Validation: {len(assigned['val'])} files\n")
+        f.write(f"Test: {len(assigned['test'])} files\n")
+        f.write("\nСтатистика по підпапках:\n")
+        for k, v in counts.items():
+            f.write(f"{k}: {v} зображень\n")
+    report_stage(progress_callback, 'done')
+
+def describe_progress(snapshot):
+    text = STAGE_NAMES.get(snapshot['stage'], snapshot['stage'])
+    if snapshot['total']:
+        text += f": {snapshot['current']}/{snapshot['total']}"
+    return text
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600} год {seconds % 3600 // 60} хв"
+    if seconds >= 60:
+        return f"{seconds // 60} хв {seconds % 60} с"
+    return f"{seconds} с"
+
+class ThumbnailCache:
+    """LRU-кеш мініатюр з обмеженням пам'яті, ключ — шлях і розмір"""
+    def __init__(self, max_bytes=THUMB_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.sizes = defaultdict(set)
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def image_bytes(img):
+        return img.width * img.height * len(img.getbands())
+
+    def get(self, path, size):
+        """Мініатюра з кешу; за потреби масштабується з більшої копії без читання файлу"""
+        with self.lock:
+            img = self.items.get((path, size))
+            if img is not None:
+                self.items.move_to_end((path, size))
+                return img
+            larger = [cached for cached in self.sizes.get(path, ()) if cached > size]
+            if not larger:
+                return None
+            base = self.items[(path, min(larger))]
+        img = base.copy()
+        img.thumbnail((size, size))
+        self.put(path, size, img)
+        return img
+
+    def put(self, path, size, img):
+        with self.lock:
+            old = self.items.pop((path, size), None)
+            if old is not None:
+                self.bytes -= self.image_bytes(old)
+            self.items[(path, size)] = img
+            self.sizes[path].add(size)
+            self.bytes += self.image_bytes(img)
+            while self.bytes > self.max_bytes and len(self.items) > 1:
+                (evicted_path, evicted_size), evicted = self.items.popitem(last=False)
+                self.bytes -= self.image_bytes(evicted)
+                self.sizes[evicted_path].discard(evicted_size)
+                if not self.sizes[evicted_path]:
+                    del self.sizes[evicted_path]
+
+def load_thumbnail(path, size):
+    from PIL import Image
+    with Image.open(open_source(path)) as img:
+        if img.format == 'JPEG':
+            img.draft('RGB', (size, size))
+        img.thumbnail((size, size))
+        if img.mode not in ('RGB', 'RGBA', 'L'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        img.load()
+        return img
+
+def load_gui_modules():
+    """Відкладений імпорт tkinter і PIL.ImageTk: потрібні лише для графічного інтерфейсу"""
+    global tk, filedialog, messagebox, scrolledtext, ttk, tkFont, Image, ImageTk
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, scrolledtext, ttk
+    import tkinter.font as tkFont
+    from PIL import Image, ImageTk
+
+class ModernApp:
+    def __init__(self, master):
+        self.master = master
+        master.title("ImagePro - Duplicate Checker & Dataset Splitter")
+        master.geometry("900x700")
+        master.minsize(800, 600)
+        master.configure(bg="#f8f9fa")
+        
+        try:
+            master.iconbitmap("app_icon.ico")
+        except:
+            pass
+        
+        self.folder = ''
+        self.snapshot = None
+        self.stop_flag = {'stop': False}
+        self.split_stop_flag = {'stop': False}
+        self.split_thread = None
+        self.ui_queue = queue.Queue()
+        self.load_settings()
+        
+        self.setup_styles()
+        
+        self.create_header()
+        self.create_main_content()
+        self.create_footer()
+        
+        self.center_window()
+        self.master.after(UI_POLL_MS, self.drain_ui_queue)
+        
+    def setup_styles(self):
+        """Налаштування сучасних стилів"""
+        style = ttk.Style()
+        style.theme_use('clam')
+        
+        self.colors = {
+            'primary': '#2563eb',
+            'primary_hover': '#1d4ed8',
+            'secondary': '#64748b',
+            'success': '#10b981',
+            'danger': '#ef4444',
+            'warning': '#f59e0b',
+            'light': '#f8fafc',
+            'dark': '#1e293b',
+            'white': '#ffffff',
+            'border': '#e2e8f0'
+        }
+        
+        self.fonts = {
+            'title': tkFont.Font(family='Segoe UI', size=20, weight='bold'),
+            'subtitle': tkFont.Font(family='Segoe UI', size=12, weight='normal'),
+            'button': tkFont.Font(family='Segoe UI', size=10, weight='bold'),
+            'label': tkFont.Font(family='Segoe UI', size=10),
+            'entry': tkFont.Font(family='Segoe UI', size=10)
+        }
+        
+        style.configure("Primary.TButton", 
+                       background=self.colors['primary'],
+                       foreground=self.colors['white'],
+                       borderwidth=0,
+                       focuscolor='none',
+                       padding=(20, 12))
+        
+        style.configure("Secondary.TButton",
+                       background=self.colors['secondary'],
+                       foreground=self.colors['white'],
+                       borderwidth=0,
+                       focuscolor='none',
+                       padding=(15, 10))
+        
+        style.configure("Success.TButton",
+                       background=self.colors['success'],
+                       foreground=self.colors['white'],
+                       borderwidth=0,
+                       focuscolor='none',
+                       padding=(15, 10))
+        
+        style.configure("Danger.TButton",
+                       background=self.colors['danger'],
+                       foreground=self.colors['white'],
+                       borderwidth=0,
+                       focuscolor='none',
+                       padding=(15, 10))
+        
+        style.configure("Title.TLabel",
+                       background=self.colors['light'],
+                       foreground=self.colors['dark'],
+                       font=self.fonts['title'])
+        
+        style.configure("Subtitle.TLabel",
+                       background=self.colors['light'],
+                       foreground=self.colors['secondary'],
+                       font=self.fonts['subtitle'])
+        
+        style.configure("Modern.TLabel",
+                       background=self.colors['white'],
+                       foreground=self.colors['dark'],
+                       font=self.fonts['label'])
+        
+        style.configure("Modern.TCheckbutton",
+                       background=self.colors['white'],
+                       foreground=self.colors['dark'],
+                       font=self.fonts['label'])
+        
+        style.configure("Modern.TEntry",
+                       fieldbackground=self.colors['white'],
+                       foreground=self.colors['dark'],
+                       borderwidth=2,
+                       relief='solid',
+                       font=self.fonts['entry'])
+        
+        style.configure("Modern.Horizontal.TProgressbar",
+                       background=self.colors['primary'],
+                       troughcolor=self.colors['border'],
+                       borderwidth=0,
+                       lightcolor=self.colors['primary'],
+                       darkcolor=self.colors['primary'])
+    
+    def create_header(self):
+        """Створення заголовка"""
+        header_frame = tk.Frame(self.master, bg=self.colors['light'], height=100)
+        header_frame.pack(fill='x', padx=20, pady=(20, 0))
+        header_frame.pack_propagate(False)
+        
+        title_label = ttk.Label(header_frame, text="ImagePro", style="Title.TLabel")
+        title_label.pack(side='left', padx=10, pady=20)
+        
+        subtitle_label = ttk.Label(header_frame, 
+                                 text="Професійний інструмент для пошуку дублікатів та розподілу датасетів",
+                                 style="Subtitle.TLabel")
+        subtitle_label.pack(side='left', padx=10, pady=25)
+    
+    def create_main_content(self):
+        """Створення основного контенту"""
+        main_frame = tk.Frame(self.master, bg=self.colors['light'])
+        main_frame.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        top_frame = tk.Frame(main_frame, bg=self.colors['light'])
+        top_frame.pack(fill='both', expand=True)
+        
+        self.create_duplicates_panel(top_frame)
+        
+        self.create_logs_panel(top_frame)
+        
+        self.create_dataset_panel(top_frame)
+    
+    def create_duplicates_panel(self, parent):
+        """Панель для пошуку дублікатів"""
+        duplicates_frame = tk.Frame(parent, bg=self.colors['white'], relief='solid', bd=1)
+        duplicates_frame.pack(side='left', fill='both', expand=True, padx=(0, 10))
+        
+        title_frame = tk.Frame(duplicates_frame, bg=self.colors['primary'], height=50)
+        title_frame.pack(fill='x')
+        title_frame.pack_propagate(False)
+        
+        ttk.Label(title_frame, text="🔍 Пошук дублікатів", 
+                 foreground=self.colors['white'], background=self.colors['primary'],
+                 font=self.fonts['button']).pack(pady=15)
+        
+        content_frame = tk.Frame(duplicates_frame, bg=self.colors['white'])
+        content_frame.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        folder_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        folder_frame.pack(fill='x', pady=(0, 20))
+        
+        ttk.Label(folder_frame, text="Оберіть папку для сканування:", 
+                 style="Modern.TLabel").pack(anchor='w', pady=(0, 10))
+        
+        self.folder_label = ttk.Label(folder_frame, text="📁 Папка не обрана", 
+                                    style="Modern.TLabel",
+                                    foreground=self.colors['secondary'])
+        self.folder_label.pack(anchor='w', pady=(0, 10))
+        
+        ttk.Button(folder_frame, text="📂 Обрати папку", 
+                  command=self.select_folder, style="Primary.TButton").pack(pady=10)
+        
+        cache_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        cache_frame.pack(fill='x')
+        
+        self.recursive_var = tk.BooleanVar(value=self.settings.get("recursive", False))
+        ttk.Checkbutton(cache_frame, text="📁 Включати підпапки",
+                       variable=self.recursive_var, style="Modern.TCheckbutton",
+                       command=self.refresh_snapshot).pack(anchor='w')
+        
+        self.archives_var = tk.BooleanVar(value=self.settings.get("archives", False))
+        ttk.Checkbutton(cache_frame, text="📦 Читати зображення з архівів zip/tar",
+                       variable=self.archives_var, style="Modern.TCheckbutton",
+                       command=self.refresh_snapshot).pack(anchor='w')
+        
+        self.use_cache_var = tk.BooleanVar(value=self.settings.get("use_cache", True))
+        ttk.Checkbutton(cache_frame, text="💾 Кешувати хеші",
+                       variable=self.use_cache_var, style="Modern.TCheckbutton").pack(anchor='w')
+        
+        self.thumbnails_var = tk.BooleanVar(value=self.settings.get("thumbnails", True))
+        ttk.Checkbutton(cache_frame, text="🖼 Зберігати мініатюри для прев’ю",
+                       variable=self.thumbnails_var, style="Modern.TCheckbutton").pack(anchor='w')
+        
+        self.rebuild_cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(cache_frame, text="♻ Перебудувати кеш",
+                       variable=self.rebuild_cache_var, style="Modern.TCheckbutton").pack(anchor='w')
+        
+        workers_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        workers_frame.pack(fill='x', pady=(10, 0))
+        
+        ttk.Label(workers_frame, text="⚙ Процесів:", style="Modern.TLabel").pack(side='left')
+        self.workers_var = tk.StringVar(value=str(self.settings.get("workers", os.cpu_count() or 1)))
+        ttk.Spinbox(workers_frame, from_=1, to=256, width=5,
+                   textvariable=self.workers_var).pack(side='right')
+        
+        threshold_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        threshold_frame.pack(fill='x', pady=(10, 0))
+        
+        ttk.Label(threshold_frame, text="🎚 Поріг схожості (0 — точні):", style="Modern.TLabel").pack(side='left')
+        self.threshold_var = tk.StringVar(value=str(self.settings.get("threshold", 0)))
+        ttk.Spinbox(threshold_frame, from_=0, to=32, width=5,
+                   textvariable=self.threshold_var).pack(side='right')
+        
+        algorithm_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        algorithm_frame.pack(fill='x', pady=(10, 0))
+        
+        ttk.Label(algorithm_frame, text="🧬 Алгоритм хешування:", style="Modern.TLabel").pack(side='left')
+        self.algorithm_var = tk.StringVar(value=self.settings.get("algorithm", DEFAULT_ALGORITHM))
+        ttk.Combobox(algorithm_frame, textvariable=self.algorithm_var, width=18,
+                    values=HASH_ALGORITHMS + ('phash+dhash', 'phash+colorhash')).pack(side='right')
+        
+        buttons_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        buttons_frame.pack(fill='x', pady=20)
+        
+        ttk.Button(buttons_frame, text="🚀 Знайти дублікати", 
+                  command=self.start_duplicates, style="Success.TButton").pack(fill='x', pady=(0, 10))
+        
+        ttk.Button(buttons_frame, text="⏹ Зупинити", 
+                  command=self.stop_duplicates, style="Danger.TButton").pack(fill='x')
+        
+        self.stats_frame = tk.Frame(content_frame, bg=self.colors['light'], relief='solid', bd=1)
+        self.stats_frame.pack(fill='x', pady=(20, 0))
+        
+        ttk.Label(self.stats_frame, text="📊 Статистика", 
+                 style="Modern.TLabel", font=self.fonts['button']).pack(pady=(10, 5))
+        
+        self.stats_text = ttk.Label(self.stats_frame, text="Готовий до сканування", 
+                                   style="Modern.TLabel")
+        self.stats_text.pack(pady=(0, 10))
+    
+    def create_dataset_panel(self, parent):
+        """Панель для розподілу датасету"""
+        dataset_frame = tk.Frame(parent, bg=self.colors['white'], relief='solid', bd=1)
+        dataset_frame.pack(side='right', fill='both', expand=True, padx=(10, 0))
+        
+        title_frame = tk.Frame(dataset_frame, bg=self.colors['success'], height=50)
+        title_frame.pack(fill='x')
+        title_frame.pack_propagate(False)
+        
+        ttk.Label(title_frame, text="📊 Розподіл датасету", 
+                 foreground=self.colors['white'], background=self.colors['success'],
+                 font=self.fonts['button']).pack(pady=15)
+        
+        content_frame = tk.Frame(dataset_frame, bg=self.colors['white'])
+        content_frame.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        ttk.Label(content_frame, text="Налаштування розподілу (%)", 
+                 style="Modern.TLabel", font=self.fonts['button']).pack(anchor='w', pady=(0, 20))
+        
+        train_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        train_frame.pack(fill='x', pady=10)
+        
+        ttk.Label(train_frame, text="🎯 Тренування:", style="Modern.TLabel").pack(side='left')
+        self.train_entry = ttk.Entry(train_frame, style="Modern.TEntry", width=10)
+        self.train_entry.pack(side='right')
+        self.train_entry.insert(0, self.settings.get("train", "70"))
+        
+        val_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        val_frame.pack(fill='x', pady=10)
+        
+        ttk.Label(val_frame, text="🔍 Валідація:", style="Modern.TLabel").pack(side='left')
+        self.val_entry = ttk.Entry(val_frame, style="Modern.TEntry", width=10)
+        self.val_entry.pack(side='right')
+        self.val_entry.insert(0, self.settings.get("val", "15"))
+        
+        test_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        test_frame.pack(fill='x', pady=10)
+        
+        ttk.Label(test_frame, text="🧪 Тестування:", style="Modern.TLabel").pack(side='left')
+        self.test_entry = ttk.Entry(test_frame, style="Modern.TEntry", width=10)
+        self.test_entry.pack(side='right')
+        self.test_entry.insert(0, self.settings.get("test", "15"))
+        
+        mode_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        mode_frame.pack(fill='x', pady=10)
+        
+        ttk.Label(mode_frame, text="📦 Режим:", style="Modern.TLabel").pack(side='left')
+        self.split_mode_var = tk.StringVar(value=self.settings.get("split_mode", "copy"))
+        ttk.Combobox(mode_frame, textvariable=self.split_mode_var, values=SPLIT_MODES,
+                    state='readonly', width=10).pack(side='right')
+        
+        seed_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        seed_frame.pack(fill='x', pady=10)
+        
+        ttk.Label(seed_frame, text="🎲 Seed (порожньо — випадково):", style="Modern.TLabel").pack(side='left')
+        self.seed_entry = ttk.Entry(seed_frame, style="Modern.TEntry", width=10)
+        self.seed_entry.pack(side='right')
+        self.seed_entry.insert(0, self.settings.get("seed", ""))
+        
+        self.manifest_only_var = tk.BooleanVar(value=self.settings.get("manifest_only", False))
+        ttk.Checkbutton(content_frame, text="📝 Лише маніфест, без файлів",
+                       variable=self.manifest_only_var, style="Modern.TCheckbutton").pack(anchor='w')
+        
+        self.incremental_var = tk.BooleanVar(value=self.settings.get("incremental", False))
+        ttk.Checkbutton(content_frame, text="➕ Розподілити лише нові файли",
+                       variable=self.incremental_var, style="Modern.TCheckbutton").pack(anchor='w')
+        
+        self.group_split_var = tk.BooleanVar(value=self.settings.get("group_split", False))
+        ttk.Checkbutton(content_frame, text="🧩 Схожі зображення — в одну підмножину",
+                       variable=self.group_split_var, style="Modern.TCheckbutton").pack(anchor='w')
+        
+        self.create_distribution_chart(content_frame)
+        
+        workers_frame = tk.Frame(content_frame, bg=self.colors['white'])
+        workers_frame.pack(fill='x', pady=10)
+        
+        ttk.Label(workers_frame, text="⚙ Потоків вводу-виводу:", style="Modern.TLabel").pack(side='left')
+        self.io_workers_var = tk.StringVar(value=str(self.settings.get("io_workers", IO_WORKERS)))
+        ttk.Spinbox(workers_frame, from_=1, to=64, width=5,
+                   textvariable=self.io_workers_var).pack(side='right')
+        
+        ttk.Button(content_frame, text="⚡ Розподілити датасет", 
+                  command=self.run_split, style="Success.TButton").pack(fill='x', pady=(20, 10))
+        
+        ttk.Button(content_frame, text="⏹ Зупинити розподіл", 
+                  command=self.stop_split, style="Danger.TButton").pack(fill='x')
+    
+    def create_distribution_chart(self, parent):
+        """Створення візуалізації розподілу"""
+        chart_frame = tk.Frame(parent, bg=self.colors['light'], relief='solid', bd=1)
+        chart_frame.pack(fill='x', pady=20)
+        
+        ttk.Label(chart_frame, text="📈 Поточний розподіл", 
+                 style="Modern.TLabel", font=self.fonts['button']).pack(pady=(10, 5))
+        
+        self.chart_container = tk.Frame(chart_frame, bg=self.colors['light'])
+        self.chart_container.pack(fill='x', padx=20, pady=(0, 10))
+        
+        self.update_chart()
+    
+    def update_chart(self):
+        """Оновлення візуалізації розподілу"""
+        for widget in self.chart_container.winfo_children():
+            widget.destroy()
+        
+        try:
+            train = float(self.train_entry.get() or 0)
+            val = float(self.val_entry.get() or 0)
+            test = float(self.test_entry.get() or 0)
+            
+            total = train + val + test
+            if total == 0:
+                return
+            
+            for name, value, color in [("Train", train, self.colors['primary']), 
+                                     ("Val", val, self.colors['warning']), 
+                                     ("Test", test, self.colors['success'])]:
+                frame = tk.Frame(self.chart_container, bg=self.colors['light'])
+                frame.pack(fill='x', pady=2)
+                
+                label = tk.Label(frame, text=f"{name}: {value}%", 
+                               bg=self.colors['light'], fg=self.colors['dark'],
+                               font=self.fonts['label'])
+                label.pack(side='left')
+                
+                bar_frame = tk.Frame(frame, bg=self.colors['border'], height=20)
+                bar_frame.pack(side='right', fill='x', expand=True, padx=(10, 0))
+                
+                if total > 0:
+                    width = int((value / 100) * 200)
+                    bar = tk.Frame(bar_frame, bg=color, height=20, width=width)
+                    bar.pack(side='left')
+                    
+        except ValueError:
+            pass
+    
+    def create_logs_panel(self, parent):
+        """Панель логів"""
+        logs_frame = tk.Frame(parent, bg=self.colors['white'], relief='solid', bd=1)
+        logs_frame.pack(side='left', fill='both', expand=True, padx=10)
+        
+        title_frame = tk.Frame(logs_frame, bg=self.colors['secondary'], height=50)
+        title_frame.pack(fill='x')
+        title_frame.pack_propagate(False)
+        
+        ttk.Label(title_frame, text="📋 Логи виконання", 
+                 foreground=self.colors['white'], background=self.colors['secondary'],
+                 font=self.fonts['button']).pack(pady=15)
+        
+        logs_content = tk.Frame(logs_frame, bg=self.colors['white'])
+        logs_content.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        self.log = scrolledtext.ScrolledText(logs_content, 
+                                           width=40, height=15,
+                                           bg=self.colors['dark'],
+                                           fg=self.colors['white'],
+                                           font=self.fonts['entry'],
+                                           wrap=tk.WORD)
+        self.log.pack(fill='both', expand=True)
+        
+        self.progress = ttk.Progressbar(logs_content, style="Modern.Horizontal.TProgressbar")
+        self.progress.pack(fill='x', pady=(10, 0))
+    
+    def create_footer(self):
+        """Створення футера"""
+        footer_frame = tk.Frame(self.master, bg=self.colors['dark'], height=40)
+        footer_frame.pack(fill='x', side='bottom')
+        footer_frame.pack_propagate(False)
+        
+        status_label = tk.Label(footer_frame, text="Готовий до роботи", 
+                               bg=self.colors['dark'], fg=self.colors['white'],
+                               font=self.fonts['label'])
+        status_label.pack(side='left', padx=20, pady=10)
+        
+        version_label = tk.Label(footer_frame, text="v2.0 Professional", 
+                                bg=self.colors['dark'], fg=self.colors['secondary'],
+                                font=self.fonts['label'])
+        version_label.pack(side='right', padx=20, pady=10)
+    
+    def center_window(self):
+        """Центрування вікна на екрані"""
+        self.master.update_idletasks()
+        width = self.master.winfo_width()
+        height = self.master.winfo_height()
+        x = (self.master.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.master.winfo_screenheight() // 2) - (height // 2)
+        self.master.geometry(f'{width}x{height}+{x}+{y}')
+    
+    def load_settings(self):
+        if os.path.exists(SETTINGS_FILE):
+            with open(SETTINGS_FILE, 'r') as f:
+                self.settings = json.load(f)
+        else:
+            self.settings = {}
+    
+    def save_settings(self):
+        self.settings = {
+            "train": self.train_entry.get(),
+            "val": self.val_entry.get(),
+            "test": self.test_entry.get(),
+            "use_cache": self.use_cache_var.get(),
+            "thumbnails": self.thumbnails_var.get(),
+            "recursive": self.recursive_var.get(),
+            "archives": self.archives_var.get(),
+            "split_mode": self.split_mode_var.get(),
+            "seed": self.seed_entry.get(),
+            "manifest_only": self.manifest_only_var.get(),
+            "incremental": self.incremental_var.get(),
+            "group_split": self.group_split_var.get(),
+            "io_workers": self.io_workers_var.get(),
+            "workers": self.workers_var.get(),
+            "threshold": self.threshold_var.get(),
+            "algorithm": self.algorithm_var.get()
+        }
+        with open(SETTINGS_FILE, 'w') as f:
+            json.dump(self.settings, f)
+    
+    def select_folder(self):
+        self.folder = filedialog.askdirectory()
+        if self.folder:
+            self.folder_label.config(text=f"📁 {os.path.basename(self.folder)}")
+            self.append_log(f"✓ Обрано папку: {self.folder}")
+            
+            self.refresh_snapshot()
+    
+    def scan_folder(self):
+        """Новий знімок папки з поточними налаштуваннями; сам перелік виконується під час обходу"""
+        return ImageSnapshot(self.folder, recursive=self.recursive_var.get(), archives=self.archives_var.get())
+
+    def refresh_snapshot(self, *args):
+        """Підрахунок зображень у фоні для показу; пошук і розподіл щоразу беруть свіжий знімок"""
+        if not self.folder:
+            return
+        snapshot = self.scan_folder()
+        self.snapshot = snapshot
+        self.stats_text.config(text="Сканування папки...")
+        
+        def count():
+            try:
+                total = len(snapshot)
+                text = f"Знайдено {total} зображень"
+            except Exception:
+                text = "Помилка читання папки"
+            if self.snapshot is snapshot:
+                self.post(self.stats_text.config, {'text': text})
+        
+        thread = threading.Thread(target=count)
+        thread.daemon = True
+        thread.start()
+    
+    def start_duplicates(self):
+        if not self.folder:
+            messagebox.showerror("Помилка", "Будь ласка, оберіть папку для сканування")
+            return
+
+        try:
+            workers = max(1, int(self.workers_var.get()))
+            threshold = max(0, int(self.threshold_var.get()))
+        except ValueError:
+            messagebox.showerror("Помилка", "Кількість процесів і поріг мають бути цілими числами")
+            return
+        try:
+            algorithm = HashEngine(self.algorithm_var.get().strip()).name
+        except ValueError as e:
+            messagebox.showerror("Помилка", f"{e}. Доступні: {', '.join(HASH_ALGORITHMS)}, через '+' для комбінації")
+            return
+
+        self.stop_flag['stop'] = False
+        self.progress['value'] = 0
+        self.append_log("🚀 Початок пошуку дублікатів...")
+
+        options = {
+            'use_cache': self.use_cache_var.get(),
+            'rebuild_cache': self.rebuild_cache_var.get(),
+            'thumbnails': self.thumbnails_var.get(),
+            'workers': workers,
+            'threshold': threshold,
+            'algorithm': algorithm,
+            'snapshot': self.scan_folder()
+        }
+        self.rebuild_cache_var.set(False)
+        self.save_settings()
+
+        thread = threading.Thread(target=self.run_duplicates, args=(options,))
+        thread.daemon = True
+        thread.start()
+    
+    def stop_duplicates(self):
+        self.stop_flag['stop'] = True
+        self.append_log("⏹ Зупинено користувачем")
+    
+    def run_duplicates(self, options):
+        try:
+            channel = ProgressChannel(lambda snapshot: self.post(self.show_progress, snapshot, coalesce=True))
+            stats = {}
+            dups = find_duplicates(self.folder, channel, self.stop_flag, stats=stats, **options)
+            
+            if not self.stop_flag['stop']:
+                self.post(self.show_results, dups, stats)
+            elif options['use_cache']:
+                self.post(self.append_log, "💾 Обчислені хеші збережено — наступний пошук продовжить з цього місця")
+                
+        except Exception as e:
+            self.post(self.show_error, str(e))
+    
+    def show_progress(self, snapshot):
+        """Відображення зведеного знімка прогресу: кількість, швидкість, залишок часу та етап"""
+        self.progress['maximum'] = max(snapshot['total'], 1)
+        self.progress['value'] = snapshot['current']
+        text = describe_progress(snapshot)
+        if snapshot['rate']:
+            text += f" · {snapshot['rate']:.0f} файлів/с · залишилось ≈ {format_eta(snapshot['eta'])}"
+        self.stats_text.config(text=text)
+    
+    def show_results(self, dups, stats=None):
+        self.progress['value'] = 0
+        if stats and stats.get('journal_completed'):
+            self.append_log(f"📒 Завершено {stats['journal_completed']} переміщень перерваного запуску")
+        if stats and stats.get('resumed'):
+            self.append_log(f"⏯ Продовжено перерване сканування: {stats['cache_hits']} хешів з контрольної точки")
+        if stats and 'cache_hits' in stats:
+            self.append_log(f"💾 Кеш: {stats['cache_hits']} з кешу, "
+                            f"{stats['cache_misses']} обчислено "
+                            f"({stats['cache_hit_rate']:.0%} влучань)")
+        if stats and 'prepass_exact' in stats:
+            self.append_log(f"🧮 Попередня перевірка: {stats['prepass_size']} відсіяно за розміром, "
+                            f"{stats['prepass_head']} — за початком файлу, "
+                            f"{stats['prepass_full']} — за вмістом; "
+                            f"{stats['prepass_exact']} точних копій без декодування")
+        if stats and stats.get('thumbnails_stored'):
+            self.append_log(f"🖼 Збережено {stats['thumbnails_stored']} мініатюр для прев’ю")
+        if stats and stats.get('skipped_large'):
+            self.append_log(f"⚠ Пропущено {stats['skipped_large']} завеликих зображень")
+        if dups:
+            moved_count = stats.get('moved', 0) if stats else 0
+            result = f"✅ Знайдено {len(dups)} груп дублікатів\n"
+            result += f"📁 Переміщено {moved_count} файлів до папки 'Duplicate'"
+            self.append_log(result)
+            self.stats_text.config(text=f"Знайдено {len(dups)} груп дублікатів")
+            self.show_duplicates_preview(dups)
+        else:
+            result = "✅ Дублікати не знайдено"
+            self.append_log(result)
+            self.stats_text.config(text="Дублікати не знайдено")
+        
+        messagebox.showinfo("Результат", result)
+
+    def show_duplicates_preview(self, dups):
+        """Відкрити вікно з прев’ю знайдених дублікатів з можливістю масштабування"""
+        DuplicatePreview(self, dups)
+    
+    def show_error(self, error):
+        self.append_log(f"❌ Помилка: {error}")
+        messagebox.showerror("Помилка", error)
+    
+    def post(self, func, *args, coalesce=False):
+        """Передача виклику з робочого потоку в чергу інтерфейсу"""
+        self.ui_queue.put((func, args, coalesce))
+    
+    def drain_ui_queue(self):
+        """Обробка черги інтерфейсу: обмежена кількість подій за такт, прогрес лише останній.
+        Накопичений прогрес застосовується перед наступною звичайною подією, щоб не затерти результати"""
+        latest = {}
+        try:
+            for _ in range(UI_BATCH):
+                try:
+                    func, args, coalesce = self.ui_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if coalesce:
+                    latest[func] = args
+                    continue
+                self.apply_latest(latest)
+                self.call_ui(func, args)
+            self.apply_latest(latest)
+        finally:
+            self.master.after(UI_POLL_MS, self.drain_ui_queue)
+    
+    def apply_latest(self, latest):
+        for func, args in latest.items():
+            self.call_ui(func, args)
+        latest.clear()
+    
+    def call_ui(self, func, args):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception("UI update %s failed", getattr(func, '__name__', func))
+    
+    def append_log(self, text):
+        self.log.insert(tk.END, f"{text}\n")
+        lines = int(self.log.index('end-1c').split('.')[0])
+        if lines > LOG_MAX_LINES:
+            self.log.delete('1.0', f"{lines - LOG_MAX_LINES}.0")
+        self.log.see(tk.END)
+    
+    def run_split(self):
+        if self.split_thread is not None and self.split_thread.is_alive():
+            messagebox.showwarning("Зачекайте", "Розподіл уже виконується")
+            return
+        try:
+            train = float(self.train_entry.get())
+            val = float(self.val_entry.get())
+            test = float(self.test_entry.get())
+            io_workers = max(1, int(self.io_workers_var.get()))
+            threshold = max(0, int(self.threshold_var.get()))
+        except ValueError:
+            messagebox.showerror("Помилка", "Будь ласка, введіть коректні числові значення")
+            return
+        
+        if abs(train + val + test - 100) > 0.01:
+            messagebox.showerror("Помилка", "Сума відсотків має дорівнювати 100%")
+            return
+        
+        if not self.folder:
+            messagebox.showerror("Помилка", "Будь ласка, оберіть папку")
+            return
+        
+        self.save_settings()
+        self.update_chart()
+        
+        self.append_log("⚡ Початок розподілу датасету...")
+        
+        options = {
+            'snapshot': self.scan_folder(),
+            'mode': self.split_mode_var.get(),
+            'io_workers': io_workers,
+            'seed': self.seed_entry.get().strip() or None,
+            'manifest': os.path.join(self.folder, MANIFEST_FILE),
+            'write_files': not self.manifest_only_var.get(),
+            'incremental': self.incremental_var.get(),
+            'group_threshold': threshold if self.group_split_var.get() else None,
+            'algorithm': self.algorithm_var.get().strip() or DEFAULT_ALGORITHM,
+            'stop_flag': self.split_stop_flag
+        }
+        self.split_stop_flag['stop'] = False
+        self.progress['value'] = 0
+        self.split_thread = threading.Thread(target=self.split_worker, args=(train, val, test, options))
+        self.split_thread.daemon = True
+        self.split_thread.start()
+    
+    def stop_split(self):
+        if self.split_thread is not None and self.split_thread.is_alive():
+            self.split_stop_flag['stop'] = True
+            self.append_log("⏹ Зупинка розподілу...")
+    
+    def split_worker(self, train, val, test, options):
+        def log_callback(text):
+            self.post(self.append_log, text)
+        
+        channel = ProgressChannel(lambda snapshot: self.post(self.show_progress, snapshot, coalesce=True))
+        try:
+            split_dataset(self.folder, train, val, test, log_callback,
+                          progress_callback=channel, **options)
+            self.post(self.split_finished, options['mode'], options['stop_flag']['stop'])
+        except Exception as e:
+            self.post(self.show_error, str(e))
+    
+    def split_finished(self, mode, stopped):
+        if mode == 'move':
+            self.refresh_snapshot()
+        if stopped:
+            self.stats_text.config(text="Розподіл зупинено")
+            return
+        self.progress['value'] = 0
+        self.append_log("✅ Датасет успішно розподілено!")
+        messagebox.showinfo("Готово", "Датасет успішно розподілено!\nЛог збережено у файл split_log.txt")
+
+class DuplicatePreview:
+    """Віртуалізоване вікно прев’ю: віджети створюються лише для видимих груп"""
+    thumbnails = ThumbnailCache()
+
+    def __init__(self, app, dups):
+        from concurrent.futures import ThreadPoolExecutor
+        self.app = app
+        self.dups = dups
+        self.rows = {}
+        self.pending = set()
+        self.resize_job = None
+        self.refresh_job = None
+        self.pool = ThreadPoolExecutor(max_workers=THUMB_WORKERS)
+        self.store = ThumbnailStore(app.folder)
+        
+        self.win = tk.Toplevel(app.master)
+        self.win.title("Прев’ю дублікатів")
+        self.win.geometry("900x700")
+        
+        size_frame = tk.Frame(self.win, bg="#f8fafc")
+        size_frame.pack(fill='x')
+        tk.Label(size_frame, text=f"Груп: {len(dups)}   Розмір мініатюр ({THUMB_MIN_SIZE}-{THUMB_MAX_SIZE}):",
+                 bg="#f8fafc").pack(side='left', padx=(10, 0))
+        self.size_var = tk.StringVar(value="150")
+        size_entry = tk.Entry(size_frame, textvariable=self.size_var, width=5)
+        size_entry.pack(side='left', padx=5, pady=5)
+        self.thumb_size = 150
+        
+        self.canvas = tk.Canvas(self.win, bg="#f8fafc", highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self.win, orient="vertical", command=self.canvas.yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.canvas.pack(fill='both', expand=True, side='left')
+        self.canvas.configure(yscrollcommand=self.on_scroll)
+        
+        self.size_var.trace_add("write", self.schedule_resize)
+        size_entry.bind('<Return>', lambda e: self.apply_size())
+        self.canvas.bind('<Configure>', lambda e: self.schedule_refresh())
+        self.canvas.bind_all("<MouseWheel>", self.on_mousewheel)
+        self.canvas.bind_all("<Button-4>", self.on_mousewheel)
+        self.canvas.bind_all("<Button-5>", self.on_mousewheel)
+        self.win.bind('<Destroy>', self.on_destroy)
+        
+        self.layout()
+    
+    @property
+    def row_height(self):
+        return self.thumb_size + PREVIEW_ROW_EXTRA
+    
+    def layout(self):
+        """Перебудова області прокрутки та видимих рядків після зміни розміру"""
+        for idx in list(self.rows):
+            self.drop_row(idx)
+        self.canvas.config(scrollregion=(0, 0, 0, len(self.dups) * self.row_height))
+        self.refresh()
+    
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.schedule_refresh()
+    
+    def on_mousewheel(self, event):
+        if event.delta:
+            self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        elif event.num == 4:
+            self.canvas.yview_scroll(-3, "units")
+        elif event.num == 5:
+            self.canvas.yview_scroll(3, "units")
+    
+    def schedule_refresh(self):
+        if self.refresh_job is None:
+            self.refresh_job = self.win.after_idle(self.refresh)
+    
+    def schedule_resize(self, *args):
+        if self.resize_job is not None:
+            self.win.after_cancel(self.resize_job)
+        self.resize_job = self.win.after(PREVIEW_DEBOUNCE_MS, self.apply_size)
+    
+    def apply_size(self):
+        self.resize_job = None
+        try:
+            thumb_size = min(max(int(self.size_var.get()), THUMB_MIN_SIZE), THUMB_MAX_SIZE)
+        except ValueError:
+            thumb_size = self.thumb_size
+        if str(thumb_size) != self.size_var.get():
+            self.size_var.set(str(thumb_size))
+            if self.resize_job is not None:
+                self.win.after_cancel(self.resize_job)
+                self.resize_job = None
+        if thumb_size != self.thumb_size:
+            self.thumb_size = thumb_size
+            self.layout()
+    
+    def refresh(self):
+        """Створення рядків, що потрапили у видиму область, і видалення решти"""
+        self.refresh_job = None
+        if not self.dups:
+            return
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first = max(0, int(top // self.row_height) - 1)
+        last = min(len(self.dups) - 1, int(bottom // self.row_height) + 1)
+        for idx in list(self.rows):
+            if idx < first or idx > last:
+                self.drop_row(idx)
+        for idx in range(first, last + 1):
+            if idx not in self.rows:
+                self.build_row(idx)
+    
+    def build_row(self, idx):
+        group = self.dups[idx]
+        frame = tk.Frame(self.canvas, bg="#f8fafc")
+        tk.Label(frame, text=f"Група {idx + 1} ({len(group)}):", font=("Segoe UI", 10, "bold"),
+                 bg="#f8fafc").pack(anchor='w', pady=(10, 0))
+        row = tk.Frame(frame, bg="#f8fafc")
+        row.pack(anchor='w', pady=(0, 10))
+        labels = {}
+        photos = []
+        for file in group:
+            lbl = tk.Label(row, text=file, compound='top', bg="#f8fafc")
+            lbl.pack(side='left', padx=5)
+            labels[file] = lbl
+            img = self.thumbnails.get(self.resolve(file), self.thumb_size)
+            if img is not None:
+                self.set_thumbnail(idx, file, img, self.thumb_size, photos=photos, labels=labels)
+            else:
+                self.request(idx, file)
+        window = self.canvas.create_window((0, idx * self.row_height), window=frame, anchor='nw')
+        self.rows[idx] = (window, frame, labels, photos)
+    
+    def drop_row(self, idx):
+        window, frame, _, _ = self.rows.pop(idx)
+        self.canvas.delete(window)
+        frame.destroy()
+    
+    def resolve(self, file):
+        duplicate = os.path.join(self.app.folder, DUPLICATE_DIR, file)
+        return duplicate if os.path.exists(duplicate) else os.path.join(self.app.folder, file)
+    
+    def request(self, idx, file):
+        """Мініатюра зі сховища кешу або декодування оригіналу у фоновому пулі"""
+        key = (idx, file, self.thumb_size)
+        if key in self.pending:
+            return
+        self.pending.add(key)
+        path = self.resolve(file)
+        size = self.thumb_size
+        
+        def work():
+            try:
+                stored = self.store.get(path, size)
+                if stored is not None:
+                    self.thumbnails.put(path, *stored)
+                else:
+                    self.thumbnails.put(path, THUMB_MAX_SIZE, load_thumbnail(path, THUMB_MAX_SIZE))
+                img = self.thumbnails.get(path, size)
+            except Exception:
+                img = None
+            self.app.post(self.deliver, key, img)
+        
+        self.pool.submit(work)
+    
+    def deliver(self, key, img):
+        self.pending.discard(key)
+        idx, file, size = key
+        if not self.win.winfo_exists() or size != self.thumb_size or idx not in self.rows:
+            return
+        if img is None:
+            self.rows[idx][2][file].config(fg="red")
+            return
+        self.set_thumbnail(idx, file, img, size)
+    
+    def set_thumbnail(self, idx, file, img, size, photos=None, labels=None):
+        if photos is None:
+            _, _, labels, photos = self.rows[idx]
+        photo = ImageTk.PhotoImage(img)
+        photos.append(photo)
+        labels[file].config(image=photo)
+    
+    def on_destroy(self, event):
+        if event.widget is not self.win:
+            return
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.store.close()
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.unbind_all(sequence)
+
+def run_gui():
+    setup_file_log(LOG_FILE)
+    load_gui_modules()
+    root = tk.Tk()
+    app = ModernApp(root)
+    
+    def on_entry_change(*args):
+        app.update_chart()
+    
+    for entry in [app.train_entry, app.val_entry, app.test_entry]:
+        entry.bind('<KeyRelease>', on_entry_change)
+    
+    root.mainloop()
+
+def cli_progress(quiet):
+    def publish(snapshot):
+        line = describe_progress(snapshot)
+        if snapshot['rate']:
+            line += f" · {snapshot['rate']:.0f} файлів/с · ETA {format_eta(snapshot['eta'])}"
+        print(f"\r{line}\033[K", end='', file=sys.stderr, flush=True)
+    return ProgressChannel((lambda snapshot: None) if quiet else publish)
+
+def setup_file_log(path):
+    handler = logging.FileHandler(path, encoding='utf-8', errors='surrogateescape')
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+
+def cli_dedup(args, metrics=None):
+    snapshot = ImageSnapshot(args.folder, recursive=args.recursive, include=args.include,
+                             exclude=args.exclude, symlinks=args.symlinks, archives=args.archives)
+    stop_flag = {'stop': False}
+    stats = {}
+    try:
+        groups = find_duplicates(args.folder, cli_progress(args.quiet), stop_flag,
+                                 use_cache=not args.no_cache, rebuild_cache=args.rebuild_cache,
+                                 stats=stats, workers=args.workers, threshold=args.threshold,
+                                 fast_decode=not args.full_decode, max_pixels=args.max_pixels,
+                                 snapshot=snapshot, exact_prepass=not args.no_prepass,
+                                 move_duplicates=not args.no_move, thumbnails=args.thumbnails,
+                                 metrics=metrics, algorithm=args.algorithm,
+                                 checkpoint_interval=args.checkpoint)
+    except KeyboardInterrupt:
+        stop_flag['stop'] = True
+        return EXIT_INTERRUPTED
+    if not args.quiet:
+        print(file=sys.stderr)
+    return {
+        'folder': os.path.abspath(args.folder),
+        'files': len(snapshot.entries) + stats.get('moved', 0),
+        'groups': groups,
+        'moved': stats.get('moved', 0),
+        'stats': stats,
+    }
+
+def cli_split(args, metrics=None):
+    if abs(args.train + args.val + args.test - 100) > 0.01:
+        raise ValueError("сума відсотків має дорівнювати 100")
+    if args.manifest_only and not args.manifest:
+        raise ValueError("--manifest-only потребує --manifest")
+    snapshot = ImageSnapshot(args.folder, recursive=args.recursive, include=args.include,
+                             exclude=args.exclude, symlinks=args.symlinks, archives=args.archives)
+    log = (lambda text: None) if args.quiet else (lambda text: print(f"\r{text}\033[K", file=sys.stderr))
+    stats = {}
+    split_dataset(args.folder, args.train, args.val, args.test, log, snapshot=snapshot,
+                  progress_callback=cli_progress(args.quiet),
+                  mode=args.mode, io_workers=args.io_workers, stats=stats, seed=args.seed,
+                  manifest=args.manifest, write_files=not args.manifest_only,
+                  incremental=args.incremental, metrics=metrics, shard_size=args.shard_size,
+                  group_threshold=args.group_threshold, algorithm=args.algorithm, hash_files=args.hashes,
+                  tolerance=args.tolerance)
+    return {'folder': os.path.abspath(args.folder), 'splits': stats.pop('splits'), 'stats': stats}
+
+def cli_watch(args, metrics=None):
+    stop_flag = {'stop': False}
+    result = {}
+
+    def decided(decision):
+        print(json.dumps(decision, ensure_ascii=False), flush=True)
+
+    finished = threading.Event()
+
+    def run():
+        try:
+            result.update(watch_folder(args.folder, stop_flag, decision_callback=decided,
+                                       progress_callback=cli_progress(args.quiet), threshold=args.threshold,
+                                       algorithm=args.algorithm, workers=args.workers,
+                                       fast_decode=not args.full_decode, max_pixels=args.max_pixels,
+                                       poll=args.poll, recursive=args.recursive, include=args.include,
+                                       exclude=args.exclude, symlinks=args.symlinks))
+        except Exception as e:
+            result['error'] = str(e)
+        finally:
+            finished.set()
+
+    # Очікування через Event, а не Thread.join: переривання join через Ctrl+C псує стан потоку
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while not finished.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        stop_flag['stop'] = True
+        finished.wait()
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    return {'folder': os.path.abspath(args.folder), **result}
+
+def collect_hashes(args, algorithm, metrics=None):
+    """Хеші папки (з кешем) без групування й переміщення; None, якщо перервано"""
+    snapshot = ImageSnapshot(args.folder, recursive=args.recursive, include=args.include,
+                             exclude=args.exclude, symlinks=args.symlinks, archives=args.archives)
+    stop_flag = {'stop': False}
+    hashes = {}
+    try:
+        find_duplicates(args.folder, cli_progress(args.quiet), stop_flag, use_cache=not args.no_cache,
+                        workers=args.workers, snapshot=snapshot, move_duplicates=False, metrics=metrics,
+                        algorithm=algorithm, hashes=hashes)
+    except KeyboardInterrupt:
+        stop_flag['stop'] = True
+        return None
+    if not args.quiet:
+        print(file=sys.stderr)
+    return hashes
+
+def cli_index_add(args, metrics=None):
+    index = ReferenceIndex.open_or_create(args.index, args.algorithm, args.blocks)
+    hashes = collect_hashes(args, args.algorithm, metrics)
+    if hashes is None:
+        return EXIT_INTERRUPTED
+    folder = os.path.abspath(args.folder)
+    added = index.append((os.path.join(folder, path), int(h, 16)) for path, h in sorted(hashes.items()))
+    return {'index': os.path.abspath(args.index), 'added': added, 'total': index.count}
+
+def cli_index_query(args, metrics=None):
+    index = ReferenceIndex(args.index)
+    index.check_radius(args.threshold)
+    hashes = collect_hashes(args, index.meta['algorithm'], metrics)
+    if hashes is None:
+        return EXIT_INTERRUPTED
+    paths = sorted(hashes)
+    found = index.query([int(hashes[path], 16) for path in paths], args.threshold)
+    matches = [{'file': path, 'reference': index.resolve(hits[0][0]), 'distance': hits[0][1], 'candidates': len(hits)}
+               for path, hits in zip(paths, found) if hits]
+    movable = [match['file'] for match in matches if split_member(match['file'])[1] is None] if args.move else []
+    if movable:
+        cache = None if args.no_cache else HashCache(args.folder, algorithm=index.meta['algorithm'])
+        for file in movable:
+            move_to_duplicates(args.folder, file, cache)
+        if cache is not None:
+            cache.close()
+    return {'folder': os.path.abspath(args.folder), 'index': os.path.abspath(args.index), 'files': len(paths),
+            'matches': matches, 'moved': len(movable)}
+
+def cli_index_merge(args, metrics=None):
+    index = ReferenceIndex(args.index)
+    added = index.merge(ReferenceIndex(args.other))
+    return {'index': os.path.abspath(args.index), 'added': added, 'total': index.count}
+
+def cli_hash_shard(args, metrics=None):
+    shard = (args.shard_index, args.shard_count)
+    snapshot = ImageSnapshot(args.folder, recursive=args.recursive, include=args.include, exclude=args.exclude,
+                             symlinks=args.symlinks, archives=args.archives, shard=shard)
+    stop_flag = {'stop': False}
+    stats = {}
+    try:
+        count = hash_shard(args.folder, args.output, shard, cli_progress(args.quiet), stop_flag, snapshot=snapshot,
+                           stats=stats, algorithm=args.algorithm, use_cache=not args.no_cache,
+                           workers=args.workers, fast_decode=not args.full_decode, max_pixels=args.max_pixels,
+                           metrics=metrics)
+    except KeyboardInterrupt:
+        stop_flag['stop'] = True
+        return EXIT_INTERRUPTED
+    if not args.quiet:
+        print(file=sys.stderr)
+    return {'folder': os.path.abspath(args.folder), 'output': os.path.abspath(args.output),
+            'shard': list(shard), 'files': count, 'stats': stats}
+
+def cli_hash_merge(args, metrics=None):
+    if args.move and not args.folder:
+        raise ValueError("--move потребує --folder")
+    metrics = metrics or NULL_METRICS
+    stats = {}
+    with metrics.timer('group'):
+        groups = merge_hash_indexes(args.indexes, args.threshold, stats=stats, partial=args.partial)
+    moved = set()
+    if args.move:
+        cache = None if args.no_cache else HashCache(args.folder, algorithm=stats['algorithm'])
+        journal = MoveJournal(args.folder, cache.conn if cache is not None else None)
+        moved = move_groups(args.folder, groups, journal, cache, metrics=metrics)
+        journal.close()
+        if cache is not None:
+            cache.close()
+    return {'files': stats.pop('files'), 'groups': groups, 'moved': len(moved), 'stats': stats}
+
+def cli_moves(args, metrics=None):
+    cache = HashCache(args.folder) if os.path.exists(os.path.join(args.folder, CACHE_FILE)) else None
+    if cache is None:
+        return {'folder': os.path.abspath(args.folder), 'pending': {}}
+    journal = MoveJournal(args.folder, cache.conn)
+    try:
+        pending = journal.pending()
+        if args.complete:
+            files = journal.complete(cache, run=args.run)
+        elif args.undo:
+            files = journal.undo(cache, run=args.run)
+        else:
+            return {'folder': os.path.abspath(args.folder), 'pending': pending}
+    finally:
+        journal.close()
+        cache.close()
+    return {'folder': os.path.abspath(args.folder), 'pending': pending,
+            'completed' if args.complete else 'restored': files}
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='imagepro',
+                                     description="Пошук дублікатів зображень і розподіл датасету")
+    commands = parser.add_subparsers(dest='command')
+
+    scan = argparse.ArgumentParser(add_help=False)
+    scan.add_argument('folder')
+    scan.add_argument('-r', '--recursive', action='store_true', help="включати підпапки")
+    scan.add_argument('--include', action='append', help="glob відносних шляхів, які треба включити")
+    scan.add_argument('--exclude', action='append', help="glob відносних шляхів, які треба пропустити")
+    scan.add_argument('--symlinks', choices=['skip', 'files', 'follow'], default='files')
+    scan.add_argument('-q', '--quiet', action='store_true', help="без прогресу в stderr")
+    scan.add_argument('--log-file', help="докладний журнал по кожному файлу")
+    scan.add_argument('--metrics', help="JSON-звіт з часом етапів і найповільнішими файлами")
+    scan.add_argument('--prometheus', help="файл метрик для textfile-колектора Prometheus")
+
+    sources = argparse.ArgumentParser(add_help=False)
+    sources.add_argument('--archives', action='store_true',
+                         help="читати зображення з zip/tar без розпакування (шляхи 'архів:член')")
+
+    dedup = commands.add_parser('dedup', parents=[scan, sources], help="знайти та перемістити дублікати")
+    dedup.add_argument('-t', '--threshold', type=int, default=0, help="поріг відстані Геммінга")
+    dedup.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    dedup.add_argument('-a', '--algorithm', default=DEFAULT_ALGORITHM,
+                       help=f"{', '.join(HASH_ALGORITHMS)} або комбінація через '+', напр. phash+dhash")
+    dedup.add_argument('--no-cache', action='store_true')
+    dedup.add_argument('--rebuild-cache', action='store_true')
+    dedup.add_argument('--no-prepass', action='store_true', help="без пошуку побайтових копій")
+    dedup.add_argument('--full-decode', action='store_true', help="декодувати в повній роздільності")
+    dedup.add_argument('--max-pixels', type=int, default=MAX_HASH_PIXELS)
+    dedup.add_argument('--no-move', action='store_true', help="лише звіт, без переміщення в Duplicate")
+    dedup.add_argument('--thumbnails', action='store_true', help="зберегти мініатюри в кеш під час хешування")
+    dedup.add_argument('--checkpoint', type=float, default=CHECKPOINT_INTERVAL,
+                       help="інтервал збереження обчислених хешів у кеш, с (0 — лише в кінці)")
+
+    hash_shard_parser = commands.add_parser('hash-shard', parents=[scan, sources],
+                                            help="захешувати один шард папки у переносний файл хешів")
+    hash_shard_parser.add_argument('--shard-index', type=int, required=True, help="номер шарду, з 0")
+    hash_shard_parser.add_argument('--shard-count', type=int, required=True, help="кількість шардів")
+    hash_shard_parser.add_argument('-o', '--output', required=True, help="файл хешів (.jsonl або .jsonl.gz)")
+    hash_shard_parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    hash_shard_parser.add_argument('-a', '--algorithm', default=DEFAULT_ALGORITHM)
+    hash_shard_parser.add_argument('--no-cache', action='store_true')
+    hash_shard_parser.add_argument('--full-decode', action='store_true', help="декодувати в повній роздільності")
+    hash_shard_parser.add_argument('--max-pixels', type=int, default=MAX_HASH_PIXELS)
+
+    hash_merge = commands.add_parser('hash-merge', help="об'єднати файли хешів шардів в одне групування дублікатів")
+    hash_merge.add_argument('indexes', nargs='+')
+    hash_merge.add_argument('-t', '--threshold', type=int, default=0, help="поріг відстані Геммінга")
+    hash_merge.add_argument('--partial', action='store_true', help="дозволити неповний набір шардів")
+    hash_merge.add_argument('--folder', help="папка, з якої хешували шарди (для --move)")
+    hash_merge.add_argument('--move', action='store_true', help="перемістити дублікати в Duplicate")
+    hash_merge.add_argument('--no-cache', action='store_true')
+    hash_merge.add_argument('--metrics', help="JSON-звіт з часом етапів")
+    hash_merge.add_argument('--prometheus', help="файл метрик для textfile-колектора Prometheus")
+
+    moves = commands.add_parser('moves', help="журнал переміщень у Duplicate: показати, завершити або скасувати")
+    moves.add_argument('folder')
+    moves.add_argument('--run', help="лише цей запуск журналу")
+    action = moves.add_mutually_exclusive_group()
+    action.add_argument('--complete', action='store_true', help="довести перервані переміщення до кінця")
+    action.add_argument('--undo', action='store_true', help="повернути переміщені файли на місце")
+
+    watch = commands.add_parser('watch', parents=[scan], help="стежити за папкою і відразу прибирати нові дублікати")
+    watch.add_argument('-t', '--threshold', type=int, default=0, help="поріг відстані Геммінга")
+    watch.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help="процеси для початкового сканування")
+    watch.add_argument('-a', '--algorithm', default=DEFAULT_ALGORITHM)
+    watch.add_argument('--full-decode', action='store_true', help="декодувати в повній роздільності")
+    watch.add_argument('--max-pixels', type=int, default=MAX_HASH_PIXELS)
+    watch.add_argument('--poll', action='store_true', help="опитування замість inotify")
+
+    index_add = commands.add_parser('index-add', parents=[scan, sources], help="додати хеші папки до еталонного індексу")
+    index_add.add_argument('--index', required=True, help="папка індексу (створюється за потреби)")
+    index_add.add_argument('-a', '--algorithm', default=DEFAULT_ALGORITHM, choices=HASH_ALGORITHMS[:-1])
+    index_add.add_argument('--blocks', type=int, default=REFERENCE_BLOCKS, choices=[1, 2, 4, 8],
+                           help="блоків у мультиіндексі нового індексу")
+    index_add.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    index_add.add_argument('--no-cache', action='store_true')
+
+    index_query = commands.add_parser('index-query', parents=[scan, sources],
+                                      help="знайти файли папки, що вже є в еталонному індексі")
+    index_query.add_argument('--index', required=True)
+    index_query.add_argument('-t', '--threshold', type=int, default=0, help="радіус Геммінга")
+    index_query.add_argument('--move', action='store_true', help="перемістити знайдені файли в Duplicate")
+    index_query.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    index_query.add_argument('--no-cache', action='store_true')
+
+    index_merge = commands.add_parser('index-merge', help="додати до індексу всі записи іншого індексу")
+    index_merge.add_argument('index')
+    index_merge.add_argument('other')
+
+    split = commands.add_parser('split', parents=[scan, sources], help="розподілити датасет")
+    split.add_argument('--train', type=float, default=70)
+    split.add_argument('--val', type=float, default=15)
+    split.add_argument('--test', type=float, default=15)
+    split.add_argument('--mode', choices=SPLIT_MODES, default='copy',
+                       help="спосіб розміщення файлів; при недоступності — копіювання")
+    split.add_argument('--io-workers', type=int, default=IO_WORKERS)
+    split.add_argument('--shard-size', type=parse_size, default=SHARD_SIZE,
+                       help="найбільший розмір tar-шарда для --mode shards, напр. 512M (типово 1G)")
+    split.add_argument('--seed', help="детермінований розподіл за хешем імені файлу")
+    split.add_argument('--manifest', help="файл маніфесту (.jsonl або .csv)")
+    split.add_argument('--manifest-only', action='store_true', help="лише маніфест, без розміщення файлів")
+    split.add_argument('--incremental', action='store_true',
+                       help="розподілити лише файли, яких ще немає в маніфесті")
+    split.add_argument('-g', '--group-threshold', type=int,
+                       help="тримати схожі зображення (відстань Геммінга ≤ порогу) в одній підмножині; "
+                            "хеші беруться з кешу попереднього dedup")
+    split.add_argument('-a', '--algorithm', default=DEFAULT_ALGORITHM, help="алгоритм хешів для --group-threshold")
+    split.add_argument('--hashes', action='append', help="файли хешів hash-shard замість кешу папки")
+    split.add_argument('--tolerance', type=float, default=SPLIT_TOLERANCE,
+                       help="допустиме відхилення від відсотків, п.п.")
+
+    commands.add_parser('gui', help="запустити графічний інтерфейс")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in (None, 'gui'):
+        run_gui()
+        return 0
+    # імена файлів, що не є коректним UTF-8, виводяться початковими байтами
+    sys.stdout.reconfigure(errors='surrogateescape')
+    if getattr(args, 'log_file', None):
+        setup_file_log(args.log_file)
+    if getattr(args, 'folder', None) and not os.path.isdir(args.folder):
+        print(json.dumps({'error': f"папку не знайдено: {args.folder}"}, ensure_ascii=False))
+        return EXIT_ERROR
+    metrics = Metrics() if getattr(args, 'metrics', None) or getattr(args, 'prometheus', None) else None
+    try:
+        handlers = {'dedup': cli_dedup, 'split': cli_split, 'watch': cli_watch,
+                    'index-add': cli_index_add, 'index-query': cli_index_query, 'index-merge': cli_index_merge,
+                    'hash-shard': cli_hash_shard, 'hash-merge': cli_hash_merge, 'moves': cli_moves}
+        result = handlers[args.command](args, metrics)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        print(json.dumps({'error': str(e)}, ensure_ascii=False))
+        return EXIT_ERROR
+    if metrics is not None and args.metrics:
+        metrics.write_json(args.metrics)
+    if metrics is not None and args.prometheus:
+        metrics.write_prometheus(args.prometheus)
+    if isinstance(result, int):
+        return result
+    print(json.dumps(result, ensure_ascii=False))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,412 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import platform
+import subprocess
+import argparse
+from itertools import combinations
+
+import imagehash
+
+from ImagePro import (hash_image, find_duplicates, split_dataset, reduce_for_hash, ImageSnapshot, Metrics,
+                      HashEngine, HashCache, IO_WORKERS, SPLIT_MODES, HASH_ALGORITHMS, HASH_CHUNK_SIZE)
+
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'bmp', 'gif', 'tiff')
+CORPUS_FORMATS = {'jpg': 'JPEG', 'png': 'PNG', 'bmp': 'BMP', 'gif': 'GIF', 'tiff': 'TIFF'}
+GROUND_TRUTH_FILE = "ground_truth.json"
+SYNTHETIC_DIR_SIZE = 10_000
+REFERENCE_HASHES = {
+    'phash': imagehash.phash,
+    'ahash': imagehash.average_hash,
+    'dhash': imagehash.dhash,
+    'whash': imagehash.whash,
+    'colorhash': imagehash.colorhash,
+}
+
+def peak_rss():
+    """Пікове використання пам'яті (байти) цього процесу та дочірніх процесів-воркерів"""
+    try:
+        import resource
+    except ImportError:
+        return {'peak_rss_bytes': None, 'peak_rss_children_bytes': None}
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return {
+        'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        'peak_rss_children_bytes': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+def synthetic_image(rng, size):
+    from PIL import Image, ImageDraw
+    width, height = size
+    img = Image.new('RGB', size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(4, 12)):
+        xs = sorted(rng.randrange(width) for _ in range(2))
+        ys = sorted(rng.randrange(height) for _ in range(2))
+        shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+        shape([xs[0], ys[0], xs[1], ys[1]], fill=tuple(rng.randrange(256) for _ in range(3)))
+    return img
+
+def near_variant(img, rng):
+    """Майже дублікат: зменшення та невелика зміна яскравості"""
+    from PIL import ImageEnhance
+    scale = rng.uniform(0.5, 0.8)
+    img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+    return ImageEnhance.Brightness(img).enhance(rng.uniform(0.9, 1.1))
+
+def save_image(img, path, ext):
+    options = {'quality': 90} if ext == 'jpg' else {}
+    img.save(path, CORPUS_FORMATS[ext], **options)
+
+def generate_corpus(folder, count, sizes, formats, exact_ratio, near_ratio, seed=0):
+    """Відтворюваний синтетичний корпус із запланованими точними та майже дублікатами"""
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    groups = []
+    files = 0
+    for idx in range(count):
+        ext = formats[idx % len(formats)]
+        img = synthetic_image(rng, rng.choice(sizes))
+        base = f"img{idx:06d}.{ext}"
+        save_image(img, os.path.join(folder, base), ext)
+        files += 1
+        group = {'exact': [base], 'near': []}
+        if rng.random() < exact_ratio:
+            copy = f"img{idx:06d}_exact.{ext}"
+            shutil.copyfile(os.path.join(folder, base), os.path.join(folder, copy))
+            group['exact'].append(copy)
+            files += 1
+        if rng.random() < near_ratio:
+            near_ext = rng.choice(formats)
+            near = f"img{idx:06d}_near.{near_ext}"
+            save_image(near_variant(img, rng), os.path.join(folder, near), near_ext)
+            group['near'].append(near)
+            files += 1
+        if len(group['exact']) + len(group['near']) > 1:
+            groups.append(group)
+
+    truth = {
+        'config': {'count': count, 'sizes': [list(size) for size in sizes], 'formats': list(formats),
+                   'exact_ratio': exact_ratio, 'near_ratio': near_ratio, 'seed': seed},
+        'files': files,
+        'groups': groups,
+    }
+    with open(os.path.join(folder, GROUND_TRUTH_FILE), 'w', encoding='utf-8') as f:
+        json.dump(truth, f, indent=2)
+    return truth
+
+def group_pairs(groups):
+    return {tuple(sorted(pair)) for group in groups for pair in combinations(group, 2)}
+
+def score_groups(predicted, truth_groups):
+    """Точність і повнота на рівні пар файлів; окремо повнота для точних і майже дублікатів"""
+    found = group_pairs(predicted)
+    expected = group_pairs(group['exact'] + group['near'] for group in truth_groups)
+    exact = group_pairs(group['exact'] for group in truth_groups)
+    near = expected - exact
+    hits = len(found & expected)
+    return {
+        'pairs_found': len(found),
+        'pairs_expected': len(expected),
+        'precision': hits / len(found) if found else 1.0,
+        'recall': hits / len(expected) if expected else 1.0,
+        'recall_exact': len(found & exact) / len(exact) if exact else 1.0,
+        'recall_near': len(found & near) / len(near) if near else 1.0,
+    }
+
+def run_info():
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+def bench_dedup(folder, workers, threshold, exact_prepass=True):
+    snapshot = ImageSnapshot(folder).load()
+    stats = {}
+    metrics = Metrics()
+    start = time.perf_counter()
+    groups = find_duplicates(folder, lambda *args: None, {'stop': False}, use_cache=False, stats=stats,
+                             workers=workers, threshold=threshold, snapshot=snapshot,
+                             exact_prepass=exact_prepass, move_duplicates=False, metrics=metrics)
+    elapsed = time.perf_counter() - start
+    result = {
+        'benchmark': 'dedup',
+        'run': run_info(),
+        'workers': workers,
+        'threshold': threshold,
+        'files': len(snapshot.entries),
+        'seconds': elapsed,
+        'files_per_sec': len(snapshot.entries) / elapsed if elapsed else 0.0,
+        'groups': len(groups),
+        'stats': stats,
+        'metrics': metrics.report()['stages'],
+    }
+    truth_path = os.path.join(folder, GROUND_TRUTH_FILE)
+    if os.path.exists(truth_path):
+        with open(truth_path, encoding='utf-8') as f:
+            result['quality'] = score_groups(groups, json.load(f)['groups'])
+    result.update(peak_rss())
+    return result
+
+def mirror_corpus(folder, entries, workdir):
+    """Жорсткі посилання (або копії між дисками) на файли корпусу в робочій папці: розподіл, зокрема
+    переміщенням, змінює лише її"""
+    for entry in entries:
+        target = os.path.join(workdir, entry.path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(os.path.join(folder, entry.path), target)
+        except OSError:
+            shutil.copy2(os.path.join(folder, entry.path), target)
+
+def bench_split(folder, mode, io_workers):
+    entries = ImageSnapshot(folder).load().entries
+    workdir = tempfile.mkdtemp(prefix='.imagepro-bench-', dir=os.path.dirname(os.path.abspath(folder)))
+    cwd = os.getcwd()
+    stats = {}
+    metrics = Metrics()
+    try:
+        mirror_corpus(folder, entries, workdir)
+        snapshot = ImageSnapshot(workdir).load()
+        os.chdir(workdir)
+        start = time.perf_counter()
+        split_dataset(workdir, 70, 20, 10, lambda message: None, snapshot=snapshot, mode=mode,
+                      io_workers=io_workers, stats=stats, seed='benchmark', metrics=metrics)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    result = {
+        'benchmark': 'split',
+        'run': run_info(),
+        'mode': mode,
+        'io_workers': io_workers,
+        'files': len(snapshot.entries),
+        'seconds': elapsed,
+        'files_per_sec': len(snapshot.entries) / elapsed if elapsed else 0.0,
+        'stats': stats,
+        'metrics': metrics.report()['stages'],
+    }
+    result.update(peak_rss())
+    return result
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def emit(result, output):
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    print(text)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+def bench_decode(folder, tolerance):
+    files = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    timings = {'full': 0.0, 'fast': 0.0}
+    distances = []
+    for filename in files:
+        path = os.path.join(folder, filename)
+        start = time.perf_counter()
+        full = hash_image(path, fast_decode=False, max_pixels=0)
+        timings['full'] += time.perf_counter() - start
+        start = time.perf_counter()
+        fast = hash_image(path, fast_decode=True, max_pixels=0)
+        timings['fast'] += time.perf_counter() - start
+        if full and fast:
+            distances.append(int(imagehash.hex_to_hash(full) - imagehash.hex_to_hash(fast)))
+
+    within = sum(1 for d in distances if d <= tolerance)
+    return {
+        'files': len(files),
+        'compared': len(distances),
+        'full_decode_files_per_sec': len(files) / timings['full'] if timings['full'] else 0.0,
+        'fast_decode_files_per_sec': len(files) / timings['fast'] if timings['fast'] else 0.0,
+        'speedup': timings['full'] / timings['fast'] if timings['fast'] else 0.0,
+        'tolerance': tolerance,
+        'max_distance': max(distances, default=0),
+        'mean_distance': sum(distances) / len(distances) if distances else 0.0,
+        'within_tolerance': within / len(distances) if distances else 1.0,
+    }
+
+def bench_engine(folder, algorithms, batch_size=HASH_CHUNK_SIZE):
+    """Пакетний HashEngine проти покрокового imagehash на вже декодованих зображеннях"""
+    from PIL import Image
+    files = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    images = []
+    for filename in files:
+        with Image.open(os.path.join(folder, filename)) as img:
+            img = reduce_for_hash(img, mode='RGB')
+            img.load()
+            images.append(img.copy())
+
+    result = {'files': len(images), 'batch_size': batch_size, 'algorithms': {}}
+    for algorithm in algorithms:
+        reference = REFERENCE_HASHES[algorithm]
+        start = time.perf_counter()
+        expected = [str(reference(img)) for img in images]
+        per_image = time.perf_counter() - start
+
+        engine = HashEngine(algorithm)
+        start = time.perf_counter()
+        batched = []
+        for offset in range(0, len(images), batch_size):
+            batched += engine.signatures([engine.prepare(img) for img in images[offset:offset + batch_size]])
+        elapsed = time.perf_counter() - start
+
+        result['algorithms'][algorithm] = {
+            'imagehash_files_per_sec': len(images) / per_image if per_image else 0.0,
+            'batched_files_per_sec': len(images) / elapsed if elapsed else 0.0,
+            'speedup': per_image / elapsed if elapsed else 0.0,
+            'identical': sum(a == b for a, b in zip(expected, batched)) / len(images) if images else 1.0,
+        }
+    return result
+
+def splitmix64(value):
+    """Детермінований 64-бітний хеш числа: різні джерела дають різні синтетичні підписи"""
+    value = (value + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return value ^ (value >> 31)
+
+def synthetic_folder(folder, count, duplicates, seed=0):
+    """Порожні файли в підпапках по SYNTHETIC_DIR_SIZE і кеш з випадковими хешами для них; частка duplicates
+    повторює хеш одного з попередніх файлів. Сканування бере всі хеші з кешу без декодування"""
+    rng = random.Random(seed)
+    cache = HashCache(folder)
+    for i in range(count):
+        rel = os.path.join(f"d{i // SYNTHETIC_DIR_SIZE:05d}", f"img{i:09d}.jpg")
+        if i % SYNTHETIC_DIR_SIZE == 0:
+            os.makedirs(os.path.join(folder, os.path.dirname(rel)), exist_ok=True)
+        path = os.path.join(folder, rel)
+        open(path, 'wb').close()
+        st = os.stat(path)
+        source = rng.randrange(i) if i and rng.random() < duplicates else i
+        cache.put(rel, st.st_size, st.st_mtime_ns, format(splitmix64(seed << 40 | source), '016x'))
+        if i % 100_000 == 0:
+            cache.flush()
+    cache.close()
+
+def scan_once(folder, threshold):
+    """Повторне сканування підготовленої папки в цьому процесі: знімок, кеш і групування"""
+    baseline = peak_rss()['peak_rss_bytes']
+    stats = {}
+    metrics = Metrics()
+    start = time.perf_counter()
+    snapshot = ImageSnapshot(folder, recursive=True)
+    groups = find_duplicates(folder, lambda *args: None, {'stop': False}, stats=stats, threshold=threshold,
+                             snapshot=snapshot, move_duplicates=False, metrics=metrics)
+    elapsed = time.perf_counter() - start
+    stages = {stage: report['seconds'] for stage, report in metrics.report()['stages'].items()}
+    result = {'files': len(snapshot.entries), 'seconds': elapsed, 'groups': len(groups),
+              'grouped_files': sum(len(group) for group in groups), 'baseline_rss_bytes': baseline,
+              'cache_hits': stats['cache_hits'], 'stage_seconds': stages,
+              'group_seconds': stages.get('group', 0.0)}
+    result.update(peak_rss())
+    if baseline and result['peak_rss_bytes']:
+        result['rss_per_file_bytes'] = (result['peak_rss_bytes'] - baseline) / max(result['files'], 1)
+    return result
+
+def bench_scan(count, duplicates, threshold, seed=0, directory=None):
+    """find_duplicates на count файлах з готовим кешем. Підготовка і сканування — в окремих процесах:
+    ru_maxrss успадковується дочірнім процесом, тож пікова пам'ять сканування не має включати підготовку"""
+    workdir = tempfile.mkdtemp(prefix='.imagepro-scan-', dir=directory)
+    command = [sys.executable, os.path.abspath(__file__), 'scan']
+    try:
+        start = time.perf_counter()
+        subprocess.run(command + ['--prepare', workdir, '-n', str(count), '--duplicates', str(duplicates),
+                                  '--seed', str(seed)], check=True)
+        setup = time.perf_counter() - start
+        output = subprocess.run(command + ['--measure', workdir, '-t', str(threshold)],
+                                check=True, capture_output=True, text=True).stdout
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    result = {'benchmark': 'scan', 'run': run_info(), 'count': count, 'duplicates': duplicates,
+              'threshold': threshold, 'setup_seconds': setup}
+    result.update(json.loads(output))
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ImagePro benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    decode = commands.add_parser('decode', help="порівняння швидкого та повного декодування для хешування")
+    decode.add_argument('folder')
+    decode.add_argument('--tolerance', type=int, default=4, help="допустима відстань Геммінга")
+
+    engine = commands.add_parser('engine', help="пакетне хешування проти imagehash: швидкість і збіг бітів")
+    engine.add_argument('folder')
+    engine.add_argument('-a', '--algorithms', default=','.join(HASH_ALGORITHMS), help="алгоритми через кому")
+    engine.add_argument('--batch-size', type=int, default=HASH_CHUNK_SIZE)
+
+    corpus = commands.add_parser('corpus', help="згенерувати синтетичний корпус з відомими дублікатами")
+    corpus.add_argument('folder')
+    corpus.add_argument('-n', '--count', type=int, default=1000, help="кількість унікальних зображень")
+    corpus.add_argument('--sizes', default='640x480,1280x720', help="роздільності через кому, напр. 640x480")
+    corpus.add_argument('--formats', default=','.join(CORPUS_FORMATS), help="формати через кому")
+    corpus.add_argument('--exact', type=float, default=0.1, help="частка зображень з точною копією")
+    corpus.add_argument('--near', type=float, default=0.1, help="частка зображень з майже дублікатом")
+    corpus.add_argument('--seed', type=int, default=0)
+
+    dedup = commands.add_parser('dedup', help="швидкість і якість пошуку дублікатів")
+    dedup.add_argument('folder')
+    dedup.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    dedup.add_argument('-t', '--threshold', type=int, default=0)
+    dedup.add_argument('--no-prepass', action='store_true')
+    dedup.add_argument('-o', '--output', help="зберегти результат у JSON-файл")
+
+    split = commands.add_parser('split', help="швидкість розподілу датасету")
+    split.add_argument('folder')
+    split.add_argument('--mode', default='copy', choices=SPLIT_MODES)
+    split.add_argument('--io-workers', type=int, default=IO_WORKERS)
+    split.add_argument('-o', '--output', help="зберегти результат у JSON-файл")
+
+    scan = commands.add_parser('scan', help="пам'ять і час find_duplicates на великій синтетичній папці з кешем")
+    scan.add_argument('-n', '--count', type=int, default=1_000_000, help="кількість файлів")
+    scan.add_argument('--duplicates', type=float, default=0.1, help="частка файлів-дублікатів")
+    scan.add_argument('-t', '--threshold', type=int, default=0)
+    scan.add_argument('--seed', type=int, default=0)
+    scan.add_argument('--dir', help="де створити тимчасову папку (типово — системна тимчасова)")
+    scan.add_argument('--prepare', metavar='FOLDER', help="лише створити синтетичну папку з кешем")
+    scan.add_argument('--measure', metavar='FOLDER', help="лише виміряти сканування готової папки в цьому процесі")
+    scan.add_argument('-o', '--output', help="зберегти результат у JSON-файл")
+
+    args = parser.parse_args(argv)
+    if args.command == 'decode':
+        result = bench_decode(args.folder, args.tolerance)
+        print(json.dumps(result, indent=2))
+        return 0 if result['max_distance'] <= args.tolerance else 1
+    if args.command == 'engine':
+        result = bench_engine(args.folder, [name.strip() for name in args.algorithms.split(',')], args.batch_size)
+        print(json.dumps(result, indent=2))
+        return 0 if all(stats['identical'] == 1.0 for stats in result['algorithms'].values()) else 1
+    if args.command == 'corpus':
+        formats = [ext.strip().lower() for ext in args.formats.split(',')]
+        unknown = [ext for ext in formats if ext not in CORPUS_FORMATS]
+        if unknown:
+            parser.error(f"невідомі формати: {', '.join(unknown)}")
+        truth = generate_corpus(args.folder, args.count, [parse_size(size) for size in args.sizes.split(',')],
+                                formats, args.exact, args.near, args.seed)
+        print(json.dumps({'folder': os.path.abspath(args.folder), 'files': truth['files'],
+                          'groups': len(truth['groups'])}))
+        return 0
+    if args.command == 'dedup':
+        emit(bench_dedup(args.folder, args.workers, args.threshold, not args.no_prepass), args.output)
+        return 0
+    if args.command == 'split':
+        emit(bench_split(args.folder, args.mode, args.io_workers), args.output)
+        return 0
+    if args.command == 'scan':
+        if args.prepare:
+            synthetic_folder(args.prepare, args.count, args.duplicates, args.seed)
+            return 0
+        if args.measure:
+            print(json.dumps(scan_once(args.measure, args.threshold)))
+            return 0
+        emit(bench_scan(args.count, args.duplicates, args.threshold, args.seed, args.dir), args.output)
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())